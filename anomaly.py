@@ -0,0 +1,96 @@
+import math
+
+from quantile_sketch import sketch_new, sketch_add, sketch_merge, sketch_items
+from topk import push_unique, merge_heaps
+from job_records import job_info
+
+# --- 流式基线与异常评分 ---
+# 基线: 每个 (用户, 软件) 的运行时长、每个队列的排队时长，各用一个粗粒度分位数草图 (有界内存、可合并、可按桶撤销)
+# 评分: 对数尺度上的稳健 z 分数 (ln x - ln 中位数) / max(1.4826 * MAD, MIN_SIGMA)，中位数与 MAD 都由草图估计；
+#       MIN_SIGMA 避免取值高度一致的基线把很小的偏差放大成高分 (ln 2: 两倍偏差至多得 1 分)
+# 候选: 同一基线内分数随取值单调递增，分数最高的作业必然是该基线中取值最大的作业。
+#       因此每个基线只需保留取值最大的 PER_BASELINE 个作业 (worker 各自维护、父进程按去重键合并)，
+#       最后用合并后的全局基线统一评分；结果与处理顺序无关，不需要保留任何作业历史。
+ANOMALY_ALPHA = 0.05
+MIN_BASELINE = 20
+MIN_SIGMA = math.log(2)
+MIN_SCORE = 3.0
+PER_BASELINE = 10
+ANOMALY_TOP = 50
+# 指标 -> (作业行中取值的下标, 基线说明)
+ANOMALY_METRICS = {'runtime': (6, "user+software"), 'wait': (5, "queue")}
+
+def anomaly_new():
+    """ {metric: {基线键: {'sketch': 草图, 'top': 取值最大的作业堆}}} """
+    return {metric: {} for metric in ANOMALY_METRICS}
+
+def _baseline_key(metric, job):
+    return (job[0], job[4]) if metric == 'runtime' else job[1]
+
+def anomaly_add(state, job, key, weight=1):
+    """ key 为作业去重键 (job_records.job_key)；weight=-1 撤销一次已计入基线的重复记录 (候选在合并时按 key 去重) """
+    info = None
+    for metric, (col, _) in ANOMALY_METRICS.items():
+        value = job[col]
+        baselines = state[metric]
+        group = _baseline_key(metric, job)
+        b = baselines.get(group)
+        if b is None: b = baselines[group] = {'sketch': sketch_new(ANOMALY_ALPHA), 'top': []}
+        sketch_add(b['sketch'], value, weight)
+        if weight < 0: continue
+        heap = b['top']
+        if len(heap) >= PER_BASELINE and (value, key) <= heap[0][:2]: continue
+        if info is None: info = job_info(job)
+        push_unique(heap, value, key, info, PER_BASELINE)
+
+def anomaly_merge(dst, src):
+    for metric, baselines in src.items():
+        d_baselines = dst[metric]
+        for group, b in baselines.items():
+            d = d_baselines.get(group)
+            if d is None:
+                d_baselines[group] = {'sketch': b['sketch'], 'top': list(b['top'])}; continue
+            sketch_merge(d['sketch'], b['sketch'])
+            d['top'] = merge_heaps(d['top'], b['top'], PER_BASELINE)
+    return dst
+
+def _weighted_median(items, total):
+    half = (total - 1) / 2
+    seen = 0
+    for v, c in items:
+        seen += c
+        if half < seen: return v
+    return items[-1][0]
+
+def baseline_stats(sk):
+    """ (作业数, 中位数, 对数尺度的 sigma)；取值按 max(v, 1) 取对数 """
+    total = sk['count']
+    if total <= 0: return 0, None, None
+    logs = [(math.log(max(v, 1.0)), c) for v, c in sketch_items(sk)]
+    med = _weighted_median(logs, total)
+    devs = sorted((abs(lv - med), c) for lv, c in logs)
+    mad = _weighted_median(devs, total)
+    return total, math.exp(med), max(1.4826 * mad, MIN_SIGMA)
+
+def anomaly_score(value, median, sigma):
+    return (math.log(max(value, 1.0)) - math.log(max(median, 1.0))) / sigma
+
+def anomaly_finalize(state, n=ANOMALY_TOP, min_score=MIN_SCORE):
+    """
+    用全局基线为全部候选评分，返回 {metric: [info + score/median/ratio/baseline_jobs, ...]} (按分数降序，最多 n 个)
+    作业数不足 MIN_BASELINE 的基线不参与评分
+    """
+    result = {}
+    for metric, baselines in state.items():
+        scored = []
+        for group, b in baselines.items():
+            count, median, sigma = baseline_stats(b['sketch'])
+            if count < MIN_BASELINE: continue
+            for value, key, info in b['top']:
+                score = anomaly_score(value, median, sigma)
+                if score < min_score: continue
+                scored.append((score, key, dict(info, score=round(score, 2), median=round(median, 1),
+                                               ratio=round(value / median, 1) if median else None, baseline_jobs=count)))
+        scored.sort(key=lambda e: e[:2], reverse=True)
+        result[metric] = [e[2] for e in scored[:n]]
+    return result
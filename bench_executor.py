@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+import argparse
+
+from run import process_single_file
+from bench_reader import make_sample_file
+from executors import starmap, choose_executor, gil_disabled
+from job_arrays import count_rows
+
+# 同一组输入分别用各执行后端解析，比较耗时并确认结果一致
+def main():
+    argparser = argparse.ArgumentParser(description="Benchmark run.py executor backends on the same input")
+    argparser.add_argument('-f', '--files', nargs='+', help='Log files to parse; default generates them from the example log')
+    argparser.add_argument('-n', '--n-files', default=4, type=int, help='Number of generated files')
+    argparser.add_argument('-l', '--lines', default=20000, type=int, help='Lines per generated file')
+    argparser.add_argument('-c', '--cores', default=os.cpu_count() or 1, type=int)
+    argparser.add_argument('--executors', nargs='+', default=['serial', 'threads', 'processes'])
+    args = argparser.parse_args()
+
+    paths = args.files or [make_sample_file("logs-template/2024/lsb.acct.example", args.lines) for _ in range(args.n_files)]
+    try:
+        size_mb = sum(os.path.getsize(p) for p in paths) / 2 ** 20
+        workers = max(1, min(args.cores, len(paths)))
+        print(f"{len(paths)} files ({size_mb:.1f} MB), {workers} workers, Python {sys.version.split()[0]}, "
+              f"GIL {'disabled' if gil_disabled() else 'enabled'}; auto -> {choose_executor('auto', paths, workers)}")
+        tasks = [(p, 0, 0, 2 ** 31) for p in paths]
+        # 先读一遍预热页缓存，避免第一个后端替后面的承担冷读
+        for p in paths:
+            with open(p, 'rb') as f:
+                while f.read(1 << 24): pass
+
+        reference = None
+        for kind in args.executors:
+            t = time.time()
+            results = starmap(kind, process_single_file, tasks, workers)
+            dt = time.time() - t
+            jobs = sum(count_rows(r[0]) for r in results)
+            if reference is None: reference = results
+            same = "ok" if results == reference else "MISMATCH"
+            print(f"  {kind:<10} {dt:8.2f}s  {size_mb / dt:8.1f} MB/s  {jobs} jobs  {same}")
+    finally:
+        if not args.files:
+            for p in paths: os.remove(p)
+
+if __name__ == '__main__':
+    main()
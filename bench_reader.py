@@ -0,0 +1,77 @@
+import io
+import os
+import time
+import argparse
+import tempfile
+
+from job_records import parse_job_line
+from prefetch_reader import iter_lines
+
+# 本地模拟 NFS: 每次 read 调用固定延迟 + 按带宽计算的传输时间
+class ThrottledFile(io.RawIOBase):
+    def __init__(self, path, latency, bandwidth):
+        self.raw = open(path, 'rb', buffering=0)
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+    def readable(self): return True
+
+    def readinto(self, b):
+        n = self.raw.readinto(b)
+        time.sleep(self.latency + (n or 0) / self.bandwidth)
+        return n
+
+    def fileno(self): return self.raw.fileno()
+
+    def close(self):
+        self.raw.close()
+        super().close()
+
+def make_sample_file(template, n_lines):
+    with open(template, 'r') as f:
+        line = [l for l in f if "JOB_FINISH" in l][0].rstrip("\n")
+    fd, path = tempfile.mkstemp(prefix="lsb.acct.bench.")
+    with os.fdopen(fd, 'w') as f:
+        for _ in range(n_lines): f.write(line + "\n")
+    return path
+
+def bench_baseline(path, opener):
+    """ 现有做法: for line in f (TextIOWrapper 默认 8KB 缓冲) """
+    jobs = 0
+    with io.TextIOWrapper(io.BufferedReader(opener(path)), encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if parse_job_line(line, 0, 2 ** 31) is not None: jobs += 1
+    return jobs
+
+def bench_prefetch(path, opener, block_size):
+    jobs = 0
+    for line in iter_lines(path, block_size=block_size, opener=opener):
+        if parse_job_line(line, 0, 2 ** 31) is not None: jobs += 1
+    return jobs
+
+def main():
+    argparser = argparse.ArgumentParser(description="Benchmark prefetching reader vs `for line in f` on a throttled file")
+    argparser.add_argument('-f', '--file', help='Log file to read; default generates one from the example log')
+    argparser.add_argument('-n', '--lines', default=20000, type=int, help='Lines in the generated file')
+    argparser.add_argument('--latency', default=0.002, type=float, help='Seconds per read call')
+    argparser.add_argument('--bandwidth', default=200, type=float, help='MB/s')
+    argparser.add_argument('--block-size', default=8, type=int, help='Prefetch block size (MB)')
+    args = argparser.parse_args()
+
+    path = args.file or make_sample_file("logs-template/2024/lsb.acct.example", args.lines)
+    try:
+        size_mb = os.path.getsize(path) / 2 ** 20
+        opener = lambda p: ThrottledFile(p, args.latency, args.bandwidth * 2 ** 20)
+        print(f"File: {path} ({size_mb:.1f} MB), latency {args.latency * 1000:.1f} ms/read, {args.bandwidth:.0f} MB/s")
+
+        for name, func in (("for line in f", lambda: bench_baseline(path, opener)),
+                           ("prefetch", lambda: bench_prefetch(path, opener, args.block_size << 20))):
+            t = time.time()
+            jobs = func()
+            dt = time.time() - t
+            print(f"  {name:<14} {dt:8.2f}s  {size_mb / dt:8.1f} MB/s  {jobs} jobs")
+    finally:
+        if not args.file: os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import os
+import random
+import shutil
+import tempfile
+import argparse
+
+from run import (process_single_file, aggregate_results, finalize_aggregate, aggregate_spilled,
+                 mytime_2_timestamp, N_PARTITIONS)
+from spill import spill_single_file
+from job_stats import JobStats
+from job_records import find_cpu_time
+from log_files import skip_duplicate_files
+from executors import starmap
+
+# 回归检查: 同一组日志分别按普通方式与 --max-memory 的落盘方式聚合，结果必须一致。
+# 生成的日志以作业数组为主，数组元素的目录交替变化 (共同字段不同，会分成多个组记录)，
+# 并带一份与其他文件部分重叠的拷贝，覆盖 run 文件的排序与用户内去重。
+YEAR = 2025
+
+def make_array_logs(template, out_dir, n_arrays, n_elems, n_single, seed):
+    with open(template) as f:
+        src = [l for l in f if "JOB_FINISH" in l][0].rstrip("\n")
+    _, _, _, command_end = find_cpu_time(src)
+    # 命令之后的第 25 个字段是数组下标 (split(' ') 的首项为空串)
+    head, tail = src[:command_end], src[command_end:].split(' ')
+    rnd = random.Random(seed)
+    base = int(mytime_2_timestamp(f"{YEAR},01,01,00,00,00"))
+    users = ['alice', 'bob', 'carol']
+
+    def make(job_id, sub, idx, user):
+        start = sub + rnd.randint(1, 20000)
+        t = list(tail); t[25] = str(idx)
+        p = (head + ' '.join(t)).split(' ')
+        p[2] = str(start + rnd.randint(5, 200000)); p[3] = str(job_id); p[7] = str(sub); p[10] = str(start)
+        p[11] = f'"{user}"'
+        if idx: p[17] = f'"run/{"ab"[idx % 2]}"'
+        return start, ' '.join(p)
+
+    lines = []
+    for a in range(n_arrays):
+        sub = base + rnd.randint(0, 300 * 86400); user = rnd.choice(users)
+        lines += [make(500000 + a, sub, i, user) for i in range(1, n_elems + 1)]
+    for j in range(n_single):
+        lines.append(make(100000 + j, base + rnd.randint(0, 300 * 86400), 0, rnd.choice(users)))
+    lines.sort()
+    halves = [[l for _, l in lines[0::2]], [l for _, l in lines[1::2]]]
+    # 部分重叠的拷贝: 第二个文件的后半加第一个文件的前三分之一
+    files = {'lsb.acct': halves[0], 'lsb.acct.1': halves[1],
+             'lsb.acct.1.old': halves[1][len(halves[1]) // 2:] + halves[0][:len(halves[0]) // 3]}
+    paths = []
+    for name, content in files.items():
+        paths.append(os.path.join(out_dir, name))
+        with open(paths[-1], 'w') as f: f.write('\n'.join(content) + '\n')
+    return paths
+
+def run_both(paths, work_dir, buffer_rows, value_limit, block_size):
+    year_start = mytime_2_timestamp(f"{YEAR},01,01,00,00,00")
+    year_end = mytime_2_timestamp(f"{YEAR},12,31,23,59,59")
+    tasks = [(p, YEAR, year_start, year_end) for p in paths]
+    agg = aggregate_results(starmap('serial', process_single_file, tasks, 1), set())
+    normal = finalize_aggregate(agg, year_start, year_end, 3600)
+
+    spill_dir = tempfile.mkdtemp(dir=work_dir)
+    tasks = [(p, YEAR, year_start, year_end, None, spill_dir, N_PARTITIONS, buffer_rows, block_size) for p in paths]
+    stats = JobStats(); runs = []
+    for local_runs, local_stats in starmap('serial', spill_single_file, tasks, 1):
+        runs.extend(local_runs); stats.merge(local_stats)
+    spilled, _ = aggregate_spilled(runs, stats, set(), year_start, year_end, 3600, spill_dir, value_limit)
+    return normal, spilled
+
+def main():
+    argparser = argparse.ArgumentParser(description="Check that --max-memory aggregation matches the normal run")
+    argparser.add_argument('--arrays', default=40, type=int, help='Job arrays to generate')
+    argparser.add_argument('--elements', default=100, type=int, help='Elements per array')
+    argparser.add_argument('--single', default=2000, type=int, help='Non-array jobs to generate')
+    argparser.add_argument('--seed', default=1, type=int)
+    args = argparser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="check-spill-")
+    try:
+        paths = skip_duplicate_files(make_array_logs("logs-template/2024/lsb.acct.example", work_dir,
+                                                     args.arrays, args.elements, args.single, args.seed))
+        # 缓冲取最小值，确保生成多个 run 文件、外部排序器落盘
+        normal, spilled = run_both(paths, work_dir, buffer_rows=500, value_limit=1000, block_size=64 << 10)
+        diffs = [(user, key) for user in sorted(set(normal) | set(spilled))
+                 for key in sorted(set(normal.get(user, {})) | set(spilled.get(user, {})))
+                 if normal.get(user, {}).get(key) != spilled.get(user, {}).get(key)]
+        print(f"{normal['all']['jobs_count']} jobs (normal), {spilled['all']['jobs_count']} jobs (--max-memory)")
+        for user, key in diffs: print(f"  MISMATCH {user}.{key}")
+        print("ok" if not diffs else "MISMATCH")
+        return 1 if diffs else 0
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    raise SystemExit(main())
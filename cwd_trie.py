@@ -0,0 +1,107 @@
+# --- 按作业工作目录 (cwd) 汇总核时的前缀树 ---
+# 每个节点保存其子树内全部作业的核秒与作业数 (含自身目录)。
+# 深度超过 MAX_DEPTH 的部分截断计入最深一层；节点数超过上限时剪枝:
+# 只保留核秒最多的一半节点，其余子树折叠进父节点的 OTHER 子节点 (OTHER 没有子节点)，内存始终有界。
+# 剪枝只丢失 "小目录" 的细节，各层合计保持精确；但保留哪些小目录与作业的处理顺序有关。
+MAX_DEPTH = 6
+USER_MAX_NODES = 128
+CLUSTER_MAX_NODES = 4096
+OTHER = "<other>"
+
+def _node():
+    return {'core_seconds': 0, 'jobs': 0, 'children': {}}
+
+def trie_new(max_nodes=USER_MAX_NODES):
+    root = _node()
+    root['max_nodes'] = max_nodes
+    root['nodes'] = 1
+    return root
+
+def cwd_components(user, cwd):
+    """ 相对路径 (LSF 中相对于用户 home) 以 '~user' 开头，避免不同用户的同名相对目录混在一起 """
+    parts = [p for p in cwd.split('/') if p and p != '.']
+    if not cwd.startswith('/'): parts.insert(0, f"~{user}")
+    elif parts: parts[0] = '/' + parts[0]
+    return parts[:MAX_DEPTH]
+
+def _add(root, components, core_seconds, jobs):
+    node = root
+    node['core_seconds'] += core_seconds
+    node['jobs'] += jobs
+    for name in components:
+        child = node['children'].get(name)
+        if child is None:
+            # 剪枝后新出现的目录照常建节点: 若之后用量变大仍可保留，否则下次剪枝再折叠
+            child = node['children'][name] = _node()
+            root['nodes'] += 1
+        child['core_seconds'] += core_seconds
+        child['jobs'] += jobs
+        node = child
+
+def trie_add(root, components, core_seconds, jobs=1):
+    _add(root, components, core_seconds, jobs)
+    if root['nodes'] > root['max_nodes']: trie_prune(root, root['max_nodes'] // 2)
+
+def _iter_nodes(node):
+    for child in node['children'].values():
+        yield child
+        yield from _iter_nodes(child)
+
+def _fold(node, keep):
+    """ 不在 keep 中的子节点 (连同子树) 折叠进 OTHER；返回剩余节点数 """
+    count = 0
+    folded = [name for name, child in node['children'].items() if name != OTHER and id(child) not in keep]
+    if folded:
+        other = node['children'].setdefault(OTHER, _node())
+        for name in folded:
+            child = node['children'].pop(name)
+            other['core_seconds'] += child['core_seconds']
+            other['jobs'] += child['jobs']
+    for child in node['children'].values():
+        count += 1 + _fold(child, keep)
+    return count
+
+def trie_prune(root, target_nodes):
+    """ 保留核秒最多的 target_nodes 个节点 (父节点核秒不小于子节点，保留集合自然连通) """
+    ranked = sorted(_iter_nodes(root), key=lambda n: n['core_seconds'], reverse=True)
+    keep = {id(n) for n in ranked[:max(1, target_nodes)]}
+    root['nodes'] = 1 + _fold(root, keep)
+
+def _merge(dst, src, root):
+    for name, s_child in src['children'].items():
+        d_child = dst['children'].get(name)
+        if d_child is None:
+            d_child = dst['children'][name] = _node()
+            root['nodes'] += 1
+        d_child['core_seconds'] += s_child['core_seconds']
+        d_child['jobs'] += s_child['jobs']
+        _merge(d_child, s_child, root)
+
+def trie_merge(dst, src):
+    """ 把 src 累加进 dst (核秒、作业数求和，可交换可结合)，超过上限时剪枝 """
+    dst['core_seconds'] += src['core_seconds']
+    dst['jobs'] += src['jobs']
+    _merge(dst, src, dst)
+    if dst['nodes'] > dst['max_nodes']: trie_prune(dst, dst['max_nodes'] // 2)
+    return dst
+
+def trie_top(root, n=10, depth=None):
+    """
+    把核秒分摊到互不重叠的目录上，返回最多的 n 个 [(路径, 核秒, 作业数), ...]
+    叶子目录计其全部；中间目录只计直接在该目录下运行的部分 (减去子目录)
+    depth: 只展开到该深度，更深的目录汇总到该层
+    """
+    rows = []
+    def walk(node, path, level=0):
+        rest_cs, rest_jobs = node['core_seconds'], node['jobs']
+        if depth is not None and level >= depth:
+            rows.append((path, rest_cs, rest_jobs)); return
+        for name, child in node['children'].items():
+            rest_cs -= child['core_seconds']
+            rest_jobs -= child['jobs']
+            walk(child, f"{path}/{name}" if path else name, level + 1)
+        if path and (rest_cs > 0 or rest_jobs > 0):
+            rows.append((path, rest_cs, rest_jobs))
+    walk(root, "")
+    rows.sort(key=lambda r: r[1], reverse=True)
+    return rows[:n]
@@ -0,0 +1,45 @@
+import os
+import sys
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+# --- 可插拔的执行后端 ---
+# serial:    当前进程内逐个执行，无进程启动与结果 pickle 开销，适合小输入或调试
+# threads:   线程池；自由线程 (free-threaded, 3.13t 起) 解释器上没有 GIL，解析可真正并行且无 IPC
+# processes: multiprocessing.Pool，普通解释器上唯一能并行解析的方式，但要 fork/启动进程并 pickle 结果
+# auto:      按解释器能力、文件数与总大小选择
+EXECUTORS = ('serial', 'threads', 'processes', 'auto')
+# 总输入小于该值时进程启动与结果传输的开销超过并行收益，auto 选择 serial
+SERIAL_MAX_BYTES = 32 << 20
+
+def gil_disabled():
+    """ 自由线程解释器且运行时未重新启用 GIL (如加载了不兼容的扩展) """
+    check = getattr(sys, '_is_gil_enabled', None)
+    return check is not None and not check()
+
+def choose_executor(name, paths, workers):
+    if name != 'auto': return name
+    if workers <= 1 or len(paths) <= 1: return 'serial'
+    total = 0
+    for p in paths:
+        try: total += os.path.getsize(p)
+        except OSError: pass
+    if total < SERIAL_MAX_BYTES: return 'serial'
+    return 'threads' if gil_disabled() else 'processes'
+
+def _call(func_args):
+    func, args = func_args
+    return func(*args)
+
+def starmap(kind, func, tasks, workers):
+    """ 与 Pool.starmap 相同的语义: 按任务顺序返回 func(*task) 的结果列表 """
+    tasks = list(tasks)
+    if kind == 'serial' or not tasks:
+        return [func(*t) for t in tasks]
+    if kind == 'threads':
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_call, [(func, t) for t in tasks]))
+    if kind == 'processes':
+        with multiprocessing.Pool(workers) as pool:
+            return pool.starmap(func, tasks)
+    raise ValueError(f"unknown executor {kind!r}, expected one of {', '.join(EXECUTORS)}")
@@ -1,71 +1,88 @@
 import os
 import time
+import pickle
 import argparse
 
+from job_records import iter_rows, job_key, JobRecord
+from anomaly import anomaly_new, anomaly_add, anomaly_finalize, ANOMALY_METRICS, ANOMALY_TOP
+from log_files import skip_duplicate_files
+
 # 阈值设置：超过多少天视为异常？
 ABNORMAL_DAYS = 30
 ABNORMAL_SECONDS = ABNORMAL_DAYS * 24 * 3600
+ANOMALY_TITLES = {'runtime': "运行时长", 'wait': "排队时长"}
 
 def timestamp_2_mytime(timestamp):
     return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
 
-def main():
-    argparser = argparse.ArgumentParser()
-    argparser.add_argument('-d', '--dir', help='Log directory', required=True)
-    args = argparser.parse_args()
-
-    print(f"🔍 正在寻找超过 {ABNORMAL_DAYS} 天的异常作业...")
+def format_hours(seconds):
+    return f"{seconds / 86400:.2f} 天" if seconds >= 86400 else f"{seconds / 3600:.2f} 小时"
 
-    if not os.path.exists(args.dir):
-        print("目录不存在")
-        return
+def print_anomalies(anomalies, n):
+    """ anomalies: anomaly_finalize 的结果 (或 {year}.bin 中 all['anomalies']) """
+    for metric, title in ANOMALY_TITLES.items():
+        jobs = anomalies.get(metric, [])[:n]
+        print(f"\n📈 {title}相对基线 ({ANOMALY_METRICS[metric][1]}) 最异常的 {len(jobs)} 个作业")
+        for j in jobs:
+            jid = f"{j['job_id']}[{j['array_idx']}]" if j['array_idx'] else str(j['job_id'])
+            print(f"⚠️ [score {j['score']:.1f}] User: {j['user']} | 软件: {j['software']} | 队列: {j['queue']} | JobID: {jid}")
+            print(f"   {title}: {format_hours(j[metric])}，是基线中位数 {format_hours(j['median'])} 的 {j['ratio']} 倍"
+                  f" (基线 {j['baseline_jobs']} 个作业)")
+            print(f"   提交时间: {timestamp_2_mytime(j['sub'])}\n")
 
-    files = [os.path.join(args.dir, f) for f in os.listdir(args.dir) if "lsb.acct" in f]
-    
+def scan_logs(files):
+    """
+    单遍扫描: 打印超过 ABNORMAL_DAYS 的作业，同时建立基线；返回异常评分结果
+    内存只与基线数有关，不保留作业 (内容相同的日志拷贝由调用方按文件剔除)
+    """
+    state = anomaly_new()
     for file_path in files:
-        with open(file_path, 'r', errors='replace') as f:
-            for line in f:
-                if "JOB_FINISH" not in line:
-                    continue
-                
-                try:
-                    parts = line.split()
-                    # 长度检查，防止索引越界
-                    if len(parts) < 15: continue
+        # 超长作业正是要找的对象，不做运行/排队时长过滤
+        for row in iter_rows([file_path], max_duration=None):
+            anomaly_add(state, row, job_key(row))
+            job = JobRecord(*row)
+            # 1. 检查运行时间异常
+            if job.runtime > ABNORMAL_SECONDS:
+                print(f"⚠️ [运行异常] User: {job.user} | 队列: {job.queue} | JobID: {job.job_id}")
+                print(f"   运行时长: {job.runtime/86400:.2f} 天")
+                print(f"   开始时间: {timestamp_2_mytime(job.start)}")
+                print(f"   结束时间: {timestamp_2_mytime(job.end)}")
+                print(f"   日志文件: {os.path.basename(file_path)}\n")
 
-                    # 提取关键信息
-                    # Index 12: Queue (队列)
-                    queue = parts[12].strip('"')
-                    user = parts[11].strip('"')
-                    job_id = parts[3] 
-                    
-                    end_time = int(parts[2])
-                    submit_time = int(parts[7])
-                    start_time = int(parts[10])
-                    
-                    if start_time == 0: continue
+            # 2. 检查排队时间异常
+            if job.wait > ABNORMAL_SECONDS:
+                print(f"⚠️ [排队异常] User: {job.user} | 队列: {job.queue} | JobID: {job.job_id}")
+                print(f"   排队时长: {job.wait/86400:.2f} 天")
+                print(f"   提交时间: {timestamp_2_mytime(job.submit)}")
+                print(f"   开始时间: {timestamp_2_mytime(job.start)}")
+                print(f"   日志文件: {os.path.basename(file_path)}\n")
+    return anomaly_finalize(state)
 
-                    run_time = end_time - start_time
-                    wait_time = start_time - submit_time
-                    
-                    # 1. 检查运行时间异常
-                    if run_time > ABNORMAL_SECONDS:
-                        print(f"⚠️ [运行异常] User: {user} | 队列: {queue} | JobID: {job_id}")
-                        print(f"   运行时长: {run_time/86400:.2f} 天")
-                        print(f"   开始时间: {timestamp_2_mytime(start_time)}")
-                        print(f"   结束时间: {timestamp_2_mytime(end_time)}")
-                        print(f"   日志文件: {os.path.basename(file_path)}\n")
-
-                    # 2. 检查排队时间异常
-                    if wait_time > ABNORMAL_SECONDS:
-                        print(f"⚠️ [排队异常] User: {user} | 队列: {queue} | JobID: {job_id}")
-                        print(f"   排队时长: {wait_time/86400:.2f} 天")
-                        print(f"   提交时间: {timestamp_2_mytime(submit_time)}")
-                        print(f"   开始时间: {timestamp_2_mytime(start_time)}")
-                        print(f"   日志文件: {os.path.basename(file_path)}\n")
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('-d', '--dir', help='Log directory to scan')
+    argparser.add_argument('-y', '--year', type=int, help='Read the anomalies run.py stored in {year}.bin instead of scanning')
+    argparser.add_argument('-b', '--bin', help='Data file, default {year}.bin')
+    argparser.add_argument('--top', default=20, type=int, help=f'Anomalies to show per metric (at most {ANOMALY_TOP})')
+    args = argparser.parse_args()
 
-                except Exception:
-                    continue
+    if args.dir:
+        print(f"🔍 正在寻找超过 {ABNORMAL_DAYS} 天的异常作业...")
+        if not os.path.exists(args.dir):
+            print("目录不存在")
+            return
+        files = skip_duplicate_files([os.path.join(args.dir, f) for f in os.listdir(args.dir) if "lsb.acct" in f])
+        print_anomalies(scan_logs(files), args.top)
+    elif args.year or args.bin:
+        data_path = args.bin or f"{args.year}.bin"
+        with open(data_path, 'rb') as f:
+            anomalies = pickle.load(f)["all"].get('anomalies')
+        if anomalies is None:
+            print(f"{data_path} has no anomaly data, please re-run run.py")
+            return
+        print_anomalies(anomalies, args.top)
+    else:
+        argparser.error("one of -d/--dir or -y/--year is required")
 
 if __name__ == "__main__":
     main()
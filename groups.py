@@ -0,0 +1,46 @@
+# --- 用户 -> 课题组 -> 院系 的多级汇总 ---
+# 映射文件每行: 用户 组 [上级组 ...]，从下往上排列，例如 "alice smithlab chemistry"；# 之后为注释。
+# 汇总在聚合完成之后进行: 把已建好的各用户统计字典合并进其所有上级组，不重新解析日志，
+# 更换映射文件只需重新汇总。同一个组在各行中的上级必须一致。
+GROUP_RANK_METRICS = ('core_hours', 'jobs_count', 'weighted_efficiency')
+
+def load_groups(path):
+    """ 返回 {user: (组, 上级组, ...)}，格式错误时抛出 ValueError """
+    mapping = {}
+    parents = {}
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            fields = line.split('#', 1)[0].split()
+            if not fields: continue
+            if len(fields) < 2:
+                raise ValueError(f"{path}:{lineno}: expected 'user group [parent ...]'")
+            user, chain = fields[0], tuple(fields[1:])
+            if user in mapping and mapping[user] != chain:
+                raise ValueError(f"{path}:{lineno}: user {user!r} is already mapped to {' > '.join(mapping[user])}")
+            for group, parent in zip(chain, chain[1:] + (None,)):
+                if parents.setdefault(group, parent) != parent:
+                    raise ValueError(f"{path}:{lineno}: group {group!r} has parent {parents[group]!r} on an earlier line")
+            mapping[user] = chain
+    return mapping
+
+def group_info(mapping):
+    """ {group: {'level': 1 为最底层, 'parent': 上级组或 None}} """
+    info = {}
+    for chain in mapping.values():
+        for level, group in enumerate(chain, 1):
+            info[group] = {'level': level, 'parent': chain[level] if level < len(chain) else None}
+    return info
+
+def _metric(d, metric):
+    if metric == 'core_hours': return d['waste_total']['core_seconds'] / 3600
+    if metric == 'weighted_efficiency': return d['waste_total']['weighted_efficiency']
+    return d[metric]
+
+def rank_members(out, members):
+    """ 组内排名 {user: {metric: 名次 (1 起)}}，数值相同时按用户名排序，结果确定 """
+    ranks = {user: {} for user in members}
+    for metric in GROUP_RANK_METRICS:
+        ordered = sorted(members, key=lambda u: (-_metric(out[u], metric), u))
+        for i, user in enumerate(ordered, 1):
+            ranks[user][metric] = i
+    return ranks
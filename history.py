@@ -0,0 +1,57 @@
+import os
+import pickle
+import argparse
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台 (Windows) 没有 fcntl，不加锁
+    fcntl = None
+
+# --- 跨年份汇总索引 history.bin ---
+# {user: {year: 年度概要}}，"all" 为集群整体。每次写出 {year}.bin 时替换该年份的全部条目，
+# 查看器展示 "历年记录" 只需读取这一个小文件，不必加载历年完整的 {year}.bin。
+# 不同年份的 run.py 可能同时运行，读改写期间持有文件锁。
+HISTORY_FILE = "history.bin"
+
+def headline(d):
+    """ 一个用户一年的概要: 作业数、运行时长、CPU 时间、平均效率、最常用软件 """
+    software = d.get('software') or {}
+    return {
+        'jobs_count': d['jobs_count'],
+        'runtime_sum': d['runtime_sum'],
+        'cpu_time_sum': d['cpu_time_sum'],
+        'mean_efficiency': d.get('mean_efficiency', 0.0),
+        'top_software': max(sorted(software), key=software.get) if software else None,
+    }
+
+def load_history(path=HISTORY_FILE):
+    if not os.path.exists(path): return {}
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+def update_history(out, year, path=HISTORY_FILE):
+    """ 用 out (写入 {year}.bin 的结果字典) 替换 history 中 year 的条目，原子写出 """
+    with open(f"{path}.lock", 'w') as lock:
+        if fcntl: fcntl.flock(lock, fcntl.LOCK_EX)
+        history = load_history(path)
+        for years in history.values():
+            years.pop(year, None)
+        for user, d in out.items():
+            history.setdefault(user, {})[year] = headline(d)
+        history = {user: years for user, years in history.items() if years}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(history, f)
+        os.replace(tmp_path, path)
+
+def main():
+    """ 由已有的 {year}.bin 补建 history.bin (升级前生成的年份) """
+    argparser = argparse.ArgumentParser(description="Rebuild history.bin entries from existing {year}.bin files")
+    argparser.add_argument('years', nargs='+', type=int)
+    args = argparser.parse_args()
+    for year in args.years:
+        with open(f"{year}.bin", 'rb') as f:
+            update_history(pickle.load(f), year)
+        print(f"Added {year} to {HISTORY_FILE}")
+
+if __name__ == '__main__':
+    main()
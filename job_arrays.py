@@ -0,0 +1,60 @@
+from array import array
+
+# --- 作业数组压缩 ---
+# 作业数组的各元素除下标、时间、CPU 时间、主机与状态外完全相同 (用户、队列、提交时间、核数、软件、作业号、目录、作业名)。
+# worker 返回值、partial 文件与 --max-memory 的 run 文件中，同一数组的元素存为一条组记录:
+# 共同字段只存一份，逐元素字段按列存储 (array.array)，体积随元素数几乎不再增长；聚合时再逐元素展开。
+# 普通作业行是 list，组记录是 tuple: (共同字段, 下标列, 排队列, 运行列, CPU 列, 主机列, 状态列)
+# 组记录排在该数组首个元素的位置。同一数组的元素共同字段也可能不同 (如 bsub -n 2,8 的核数、各元素的目录)，
+# 此时会分成几个组记录；有序输入 (按去重键排序的 run 文件) 用 contiguous=True: 只向最近的组追加，
+# 共同字段一变就开始新的组记录，展开后与原顺序完全一致，重复记录仍彼此相邻。
+
+class RowCompactor:
+    """
+    逐行追加作业行，数组元素 (array_idx != 0) 归入组记录
+    contiguous=True: 只合并连续的元素，展开后保持输入顺序
+    """
+    def __init__(self, contiguous=False):
+        self.items = []
+        self.rows = 0
+        self.contiguous = contiguous
+        self._groups = {}
+        self._hosts = {}
+
+    def add(self, job):
+        self.rows += 1
+        if not job[10]:
+            if self.contiguous: self._groups.clear()
+            self.items.append(job); return
+        user, queue, sub_ts, cores, soft, wait, run, cpu, hosts, job_id, array_idx, cwd, name, status = job
+        shared = (user, queue, sub_ts, cores, soft, job_id, cwd, name)
+        group = self._groups.get(shared)
+        if group is None:
+            if self.contiguous: self._groups.clear()
+            group = self._groups[shared] = (shared, array('i'), array('q'), array('q'), array('d'), [], array('i'))
+            self.items.append(group)
+        group[1].append(array_idx)
+        group[2].append(wait)
+        group[3].append(run)
+        group[4].append(cpu)
+        # 同一组节点的主机元组只保留一个对象，pickle 时只写一次
+        group[5].append(self._hosts.setdefault(hosts, hosts))
+        group[6].append(status)
+
+def compact_rows(rows):
+    """ 有序的作业行 -> 组记录，展开后顺序不变 """
+    c = RowCompactor(contiguous=True)
+    for job in rows: c.add(job)
+    return c.items
+
+def expand_rows(items):
+    """ 把普通作业行与组记录还原为逐作业的作业行 """
+    for item in items:
+        if type(item) is list:
+            yield item; continue
+        (user, queue, sub_ts, cores, soft, job_id, cwd, name), idxs, waits, runs, cpus, hosts, statuses = item
+        for i in range(len(idxs)):
+            yield [user, queue, sub_ts, cores, soft, waits[i], runs[i], cpus[i], hosts[i], job_id, idxs[i], cwd, name, statuses[i]]
+
+def count_rows(items):
+    return sum(1 if type(item) is list else len(item[1]) for item in items)
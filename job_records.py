@@ -0,0 +1,349 @@
+import re
+
+from prefetch_reader import iter_lines, BLOCK_SIZE
+
+# --- JOB_FINISH 记录解析与流式遍历 ---
+# run.py / run_old.py / find_outliers.py 共用同一条解析热路径。
+# iter_rows / iter_jobs 支持谓词下推: 时间窗口、用户、队列这些廉价条件直接在原始字节上用
+# 只切分前 14 个字段的 split 判断，不满足的记录跳过解码、全字段切分、正则与软件识别。
+
+# --- 正则修复 ---
+# 旧正则: r'"([^"]*)"...' 遇到 "" 会失败
+# 新正则: r'"((?:[^"]|"")*)"...' 能匹配包含 "" 的字段
+CPU_TIME_PATTERN = re.compile(r'"((?:[^"]|"")*)"\s+"((?:[^"]|"")*)"\s+([0-9\.]+)')
+_NUMBER = re.compile(r'[0-9\.]+')
+
+# JOB_FINISH 中 parts[23] 为执行槽位数 (numExHosts)，其后每个槽位一个主机名
+EXEC_HOSTS_INDEX = 24
+# ru_utime 之后: 其余 18 项 rusage, mailUser, projectName, exitStatus, maxNumProcessors, loginShell, timeEvent, idx
+IDX_AFTER_COMMAND = 24
+# 运行或排队超过一年的记录视为异常
+MAX_DURATION = 365 * 86400
+# 执行主机列表之后紧跟 jStatus 位掩码: 32 为 EXIT (非零退出或被 kill)，64 为 DONE；可能与其他状态位同时置位，按位判断
+JOB_STAT_EXIT = 32
+JOB_STAT_DONE = 64
+# 作业数组缓存 {(作业号, 提交时间): (作业名, 命令前缀, 软件)} 的容量，超过后清空重建
+ARRAY_CACHE_SIZE = 4096
+
+def decode_exec_hosts(parts, num_slots):
+    """
+    单次遍历把逐槽位主机列表压缩为游程 [(host, slots), ...]
+    例如 28 个 "xc09n11" -> ("xc09n11", 28)
+    """
+    hosts = []
+    last = None; slots = 0
+    for tok in parts[EXEC_HOSTS_INDEX:EXEC_HOSTS_INDEX + num_slots]:
+        if tok == last:
+            slots += 1
+            continue
+        if last is not None: hosts.append((last.strip('"'), slots))
+        last = tok; slots = 1
+    if last is not None: hosts.append((last.strip('"'), slots))
+    return tuple(hosts)
+
+def classify_software(line):
+    """ 按整行内容 (不区分大小写) 识别软件 """
+    soft_mark = 0
+    line_soft = line.lower()   
+    software = "others"
+    if "g16" in line_soft or "g09" in line_soft or "g03" in line_soft and ".gjf" in line_soft and soft_mark == 0:
+        software = "gaussian"
+        soft_mark = 1
+    elif "vasp" in line_soft and "mpirun" in line_soft and soft_mark == 0:
+        software = "vasp"
+        soft_mark = 1
+    elif "qchem" in line_soft and soft_mark == 0:
+        software = "qchem"
+        soft_mark = 1
+    elif "cp2k" in line_soft and soft_mark == 0:
+        software = "cp2k"
+        soft_mark = 1
+    elif "lmp " in line_soft or "lmp_" in line_soft or "lmp-" in line_soft or "lammps" in line_soft or "LAMMPS" in line_soft and soft_mark == 0:
+        software = "lammps"
+        soft_mark = 1
+    elif "pmemd" in line_soft and soft_mark == 0:
+        software = "amber"
+        soft_mark = 1
+    elif "gmx " in line_soft and soft_mark == 0:
+        software = "gromacs"
+        soft_mark = 1
+    elif "namd2 " in line_soft or "namd3 " in line_soft or "charmrun" in line_soft and soft_mark == 0:
+        software = "namd"
+        soft_mark = 1
+    elif "xtb " in line_soft and soft_mark == 0:
+        software = "xtb"
+        soft_mark = 1
+    elif "orca" in line_soft and "openmpi" in line_soft and soft_mark == 0:
+        software = "orca"
+        soft_mark = 1
+    elif "nwchem " in line_soft and soft_mark == 0:
+        software = "nwchem"
+        soft_mark = 1
+    elif "rest" in line_soft and soft_mark == 0:
+        software = "rest"
+        soft_mark = 1
+    elif "xcfour" in line_soft and soft_mark == 0:
+        software = "cfour"
+        soft_mark = 1
+    elif "molcas" in line_soft or "pymolcas " in line_soft and soft_mark == 0:
+        software = "molcas"
+        soft_mark = 1
+    elif "molpro" in line_soft and soft_mark == 0:
+        software = "molpro"
+        soft_mark = 1
+    elif "psi4" in line_soft and soft_mark == 0:
+        software = "psi4"
+        soft_mark = 1
+    elif "pyscf" in line_soft and "python" in line_soft and soft_mark == 0:
+        software = "pyscf"
+        soft_mark = 1
+    elif "aims" in line_soft and soft_mark == 0:
+        software = "aims"
+        soft_mark = 1
+    elif "jdftx" in line_soft and soft_mark == 0:
+        software = "jdftx"
+        soft_mark = 1
+    elif "pw.x" in line_soft or "dos.x" in line_soft or "bands.x" in line_soft or "pp.x" in line_soft and soft_mark == 0:
+        software = "quantum espresso"
+        soft_mark = 1
+    elif "cmake" in line_soft and soft_mark == 0:
+        software = "cmake build"
+        soft_mark = 1
+    elif "make" in line_soft and soft_mark == 0:
+        software = "make build"
+        soft_mark = 1
+    elif "python" in line_soft or "python3" in line_soft and soft_mark == 0:
+        software = "python program"
+        soft_mark = 1
+    else:
+        software = "others"
+        soft_mark = 1
+    # --- 逻辑结束 ---
+    return software
+
+def find_cpu_time(line):
+    """
+    在整行中定位 "作业名" "命令" CPU_Time 三元组
+    返回 (作业名, '"作业名" "命令" ' 原文前缀, CPU Time, 匹配结束位置)；找不到有效字段返回 None
+    """
+    # --- 修复核心：智能提取 CPU Time ---
+    cpu_time = 0.0
+    command_prefix = ""
+    job_name = ""
+    command_end = 0
+
+    found_valid_cpu = False
+    for m in CPU_TIME_PATTERN.finditer(line):
+        # m = (Group1_Str, Group2_Str, Group3_Num)
+        g1_str, g2_str, g3_num = m.groups()
+
+        try:
+            val = float(g3_num)
+            
+            # 1. 过滤头部的时间戳 (Group2如果是纯数字字符串，通常是timestamp)
+            #    例如: "%J.err" "1733150264.13" 0
+            try:
+                if float(g2_str) > 0: 
+                    continue # Group2 是数字，说明这是 timestamp 字段，跳过
+            except:
+                pass # Group2 不是数字，可能是 Command，继续检查
+
+            # 2. 过滤 JOB_FINISH
+            if g1_str == "JOB_FINISH": continue
+            
+            # 3. 过滤 "default" (Ask String 字段)
+            if g2_str == "default": continue
+
+            # 4. 过滤 Host 列表 (通常 Host1 == Host2，或者是在 Host 列表末尾)
+            #    例如: "hostA" "hostA" 64 (Int)
+            #    而 Command 字段通常 G1(JobName) != G2(Command)
+            if g1_str == g2_str: continue
+            
+            # 5. 过滤空字符串
+            if g1_str == "" and g2_str == "": continue
+
+            # 通过所有过滤，认为是有效的 CPU Time
+            # 我们不断更新 cpu_time，因为 LSF 日志中 Command 字段出现在 Host 字段之后
+            # 最后的有效匹配通常就是 Command
+            command_prefix = line[m.start():m.start(3)]
+            job_name = g1_str
+            cpu_time = val
+            command_end = m.end()
+            found_valid_cpu = True
+
+        except:
+            continue
+            
+    if not found_valid_cpu:
+        return None
+    # -------------------------------
+    return job_name, command_prefix, cpu_time, command_end
+
+def _cpu_time_after(line, command_prefix):
+    """ 作业数组快速路径: 已知 "作业名" "命令" 前缀时直接查找，读取其后的 CPU Time """
+    pos = line.find(command_prefix)
+    if pos < 0: return None
+    m = _NUMBER.match(line, pos + len(command_prefix))
+    if m is None: return None
+    try: return float(m.group()), m.end()
+    except ValueError: return None
+
+def parse_job_line(line, year_start, year_end, max_duration=MAX_DURATION, arrays=None):
+    """
+    解析单行 JOB_FINISH 记录 (提交时间在 [year_start, year_end] 内)
+    返回 [user, queue, sub_ts, cores, software, wait, run, cpu, hosts, job_id, array_idx, cwd, job_name, status]；非目标记录或格式异常返回 None
+    max_duration: 运行或排队时间超过该值的记录视为异常丢弃，None 表示不过滤
+    arrays: 调用方持有的作业数组缓存 dict，同一数组只做一次 CPU Time 全行匹配与软件识别
+    """
+    if "JOB_FINISH" not in line: return None
+    try:
+        parts = line.split()
+        if len(parts) < 20: return None
+
+        user = parts[11].strip('"')
+        queue = parts[12].strip('"')
+        cwd = parts[17].strip('"')
+        timesub_stamp = int(parts[7])
+        timestart_stamp = int(parts[10])
+        timeend_stamp = int(parts[2])
+        
+        try:
+            cores = int(parts[23])
+            hosts = decode_exec_hosts(parts, cores)
+        except:
+            cores = 1
+            hosts = ()
+            status = 0
+        else:
+            try: status = int(parts[EXEC_HOSTS_INDEX + cores])
+            except: status = 0
+
+        if timestart_stamp == 0: return None
+        if not year_start <= timesub_stamp <= year_end: return None
+
+        # 作业数组的其余元素与首个元素的命令、作业名相同: 直接查找已知前缀读取 CPU Time，沿用已识别的软件
+        array_key = (parts[3], timesub_stamp)
+        cached = arrays.get(array_key) if arrays is not None else None
+        hit = _cpu_time_after(line, cached[1]) if cached is not None else None
+        if hit is not None:
+            job_name, command_prefix, software = cached
+            cpu_time, command_end = hit
+        else:
+            found = find_cpu_time(line)
+            if found is None: return None
+            job_name, command_prefix, cpu_time, command_end = found
+            software = None
+
+        # 作业数组下标在 Command 之后，按空格切分的下标会随命令内容漂移，因此从 CPU Time 匹配结束处开始数
+        job_id = int(parts[3])
+        try: array_idx = int(line[command_end:].split()[IDX_AFTER_COMMAND])
+        except: array_idx = 0
+
+        if software is None:
+            software = classify_software(line)
+            if arrays is not None and array_idx:
+                if len(arrays) >= ARRAY_CACHE_SIZE: arrays.clear()
+                arrays[array_key] = (job_name, command_prefix, software)
+        
+        run_time = timeend_stamp - timestart_stamp
+        wait_time = timestart_stamp - timesub_stamp
+        
+        # 宽松过滤，保留真实长作业
+        if max_duration is not None and (run_time > max_duration or wait_time > max_duration): return None
+
+        return [user, queue, timesub_stamp, cores, software, wait_time, run_time, cpu_time, hosts, job_id, array_idx, cwd, job_name, status]
+    except: return None
+
+# 谓词下推只需要前 14 个字段: [2] 结束 [7] 提交 [10] 开始 [11] 用户 [12] 队列
+_HEAD_SPLIT = 13
+NO_LIMIT = 1 << 62
+
+class JobRecord:
+    """ 单个作业；字段顺序与 parse_job_line 返回的作业行一致 """
+    __slots__ = ('user', 'queue', 'submit', 'cores', 'software', 'wait', 'runtime', 'cpu',
+                 'hosts', 'job_id', 'array_idx', 'cwd', 'name', 'status')
+
+    def __init__(self, user, queue, submit, cores, software, wait, runtime, cpu, hosts, job_id, array_idx, cwd, name, status):
+        self.user = user; self.queue = queue; self.submit = submit; self.cores = cores
+        self.software = software; self.wait = wait; self.runtime = runtime; self.cpu = cpu
+        self.hosts = hosts; self.job_id = job_id; self.array_idx = array_idx; self.cwd = cwd; self.name = name
+        self.status = status
+
+    @property
+    def start(self): return self.submit + self.wait
+
+    @property
+    def end(self): return self.submit + self.wait + self.runtime
+
+    @property
+    def core_seconds(self): return self.runtime * self.cores
+
+    @property
+    def failed(self): return bool(self.status & JOB_STAT_EXIT)
+
+    @property
+    def efficiency(self): return job_efficiency(self.row())
+
+    def row(self):
+        return [getattr(self, f) for f in self.__slots__]
+
+    def __repr__(self):
+        return f"JobRecord({self.job_id}[{self.array_idx}] {self.user}@{self.queue} submit={self.submit})"
+
+def job_efficiency(job):
+    """ CPU 效率 (%) = CPU 时间 / (运行时长 x 核数)，封顶 100 """
+    cores, run, cpu = job[3], job[6], job[7]
+    eff = (cpu / (run * cores)) * 100 if run > 0 and cores > 0 else 0
+    return 100 if eff > 100 else eff
+
+def job_info(job):
+    """ Top-K 与异常作业的展示用信息；sub/start/end 为时间戳 """
+    start = job[2] + job[5]
+    return {'job_id': job[9], 'array_idx': job[10], 'name': job[12], 'user': job[0], 'queue': job[1], 'software': job[4],
+            'cores': job[3], 'sub': job[2], 'start': start, 'end': start + job[6], 'runtime': job[6], 'wait': job[5],
+            'core_hours': job[6] * job[3] / 3600, 'efficiency': round(job_efficiency(job), 2)}
+
+def job_key(job):
+    """ (提交时间, 作业号, 数组下标) 无损打包成单个 int，比三元组 tuple 省内存；用于去重 """
+    return (((job[2] << 32) | job[9]) << 32) | job[10]
+
+def user_sort_key(job):
+    """ --max-memory 模式下 run 文件的排序键: 同一用户相邻，重复记录彼此相邻 """
+    return (job[0], job_key(job))
+
+def _quoted_set(names):
+    return None if names is None else {n.encode() for n in names}
+
+def iter_rows(paths, since=None, until=None, users=None, queues=None, max_duration=MAX_DURATION, next_path=None,
+              block_size=BLOCK_SIZE):
+    """
+    逐个文件流式返回作业行 (parse_job_line 的格式)，提交时间在 [since, until] 内
+    users / queues: 名称集合，None 表示不过滤
+    next_path: 最后一个文件读完后提示内核预读的文件
+    block_size: 预读块大小，读取器 (队列中的块、拼接与切分出的行) 约占用其 10 倍内存，--max-memory 按预算缩小
+    """
+    lo = NO_LIMIT * -1 if since is None else since
+    hi = NO_LIMIT if until is None else until
+    users_b = _quoted_set(users); queues_b = _quoted_set(queues)
+    paths = list(paths)
+    for i, path in enumerate(paths):
+        nxt = paths[i + 1] if i + 1 < len(paths) else next_path
+        arrays = {}
+        for raw in iter_lines(path, block_size, next_path=nxt, encoding=None):
+            if b"JOB_FINISH" not in raw: continue
+            head = raw.split(None, _HEAD_SPLIT)
+            if len(head) <= _HEAD_SPLIT: continue
+            try:
+                sub = int(head[7])
+                if int(head[10]) == 0 or not lo <= sub <= hi: continue
+            except ValueError:
+                continue
+            if users_b is not None and head[11].strip(b'"') not in users_b: continue
+            if queues_b is not None and head[12].strip(b'"') not in queues_b: continue
+            row = parse_job_line(raw.decode('utf-8', 'replace'), lo, hi, max_duration, arrays)
+            if row is not None: yield row
+
+def iter_jobs(paths, since=None, until=None, users=None, queues=None, max_duration=MAX_DURATION):
+    """ 与 iter_rows 相同，返回 JobRecord 对象 """
+    for row in iter_rows(paths, since, until, users, queues, max_duration):
+        yield JobRecord(*row)
@@ -0,0 +1,44 @@
+from job_records import job_key
+from quantile_sketch import add_wait_sketch, merge_wait_sketch
+from topk import top_add, top_merge
+from anomaly import anomaly_new, anomaly_add, anomaly_merge
+
+# --- worker 内逐作业更新的附加统计 ---
+# 排队时间草图、Top-K 作业与异常基线都在 worker 解析时逐作业更新、在父进程合并，
+# 去重在合并之后才进行，重复记录再从父进程的状态中撤销。三者放在一个对象里，
+# worker 返回值、partial 文件与各处的更新/撤销只需处理这一个对象。
+
+class JobStats:
+    """
+    wait_sketch: {queue: {month: sketch}}
+    top:         每个用户各指标的 Top-K 作业 {user: {metric: heap}}
+    anomaly:     每个 (用户, 软件) 运行时长与每个队列排队时长的基线草图及候选作业
+    """
+    __slots__ = ('wait_sketch', 'top', 'anomaly')
+
+    def __init__(self):
+        self.wait_sketch = {}
+        self.top = {}
+        self.anomaly = anomaly_new()
+
+    def __eq__(self, other):
+        return (isinstance(other, JobStats) and self.wait_sketch == other.wait_sketch
+                and self.top == other.top and self.anomaly == other.anomaly)
+
+    def add(self, job):
+        add_wait_sketch(self.wait_sketch, job)
+        key = job_key(job)
+        top_add(self.top, job, key)
+        anomaly_add(self.anomaly, job, key)
+
+    def undo(self, job):
+        """ 撤销一次已计入的重复记录: 草图按桶计数可精确撤销；Top-K 与异常候选在合并时已按去重键去重 """
+        add_wait_sketch(self.wait_sketch, job, weight=-1)
+        anomaly_add(self.anomaly, job, job_key(job), weight=-1)
+
+    def merge(self, other):
+        """ 把 other 合并进 self (按去重键合并，重复记录不会占两个名次) """
+        merge_wait_sketch(self.wait_sketch, other.wait_sketch)
+        top_merge(self.top, other.top)
+        anomaly_merge(self.anomaly, other.anomaly)
+        return self
@@ -0,0 +1,38 @@
+import os
+import hashlib
+
+# --- 日志文件去重 ---
+# 备份或拷贝出来的 lsb.acct.N 与原文件内容完全相同，按整文件指纹只保留一份；
+# 指纹同时是 partial 文件中解析结果的键 (见 partial.py)。
+
+def file_fingerprint(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def skip_duplicate_files(log_files, aliases=None):
+    """
+    按整文件指纹剔除完全相同的日志拷贝 (如备份的 lsb.acct.3)，返回按路径排序的文件列表
+    先按文件大小分组，只有大小相同的文件才需要读取计算哈希
+    aliases: 传入 dict 时记录 {保留的路径: [被剔除的相同拷贝, ...]}
+    """
+    by_size = {}
+    for path in sorted(log_files):
+        by_size.setdefault(os.path.getsize(path), []).append(path)
+
+    unique = []
+    for paths in by_size.values():
+        if len(paths) == 1:
+            unique.extend(paths); continue
+        seen = {}
+        for path in paths:
+            fp = file_fingerprint(path)
+            if fp in seen:
+                print(f"Skip {os.path.basename(path)}: identical to {os.path.basename(seen[fp])}")
+                if aliases is not None: aliases.setdefault(seen[fp], []).append(path)
+                continue
+            seen[fp] = path
+            unique.append(path)
+    return sorted(unique)
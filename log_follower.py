@@ -0,0 +1,66 @@
+import os
+
+# LSF 正在写入的记账文件；轮转时被重命名为 lsb.acct.1，并新建空的 lsb.acct
+ACTIVE_LOG = "lsb.acct"
+
+class LogFollower:
+    """
+    轮询方式跟踪活动日志 (类似 tail -F)，每次 poll() 只返回新追加的完整行
+    - inode 变化: 文件已轮转。旧文件句柄仍指向 lsb.acct.1，先读完其剩余内容，再从头打开新文件
+    - size 变小: 文件被截断，从头重新读取
+    - 末尾没有换行的半行先缓存，等下次写完整后再返回
+    """
+    def __init__(self, path):
+        self.path = path
+        self.f = None
+        self.inode = None
+        self.offset = 0
+        self.partial = ""
+
+    def _open(self):
+        try:
+            f = open(self.path, 'r', encoding='utf-8', errors='replace')
+        except FileNotFoundError:
+            return False
+        self.f = f
+        self.inode = os.fstat(f.fileno()).st_ino
+        self.offset = 0
+        self.partial = ""
+        return True
+
+    def _read_new(self):
+        data = self.f.read()
+        if not data: return []
+        self.offset = self.f.tell()
+        data = self.partial + data
+        lines = data.split('\n')
+        self.partial = lines.pop()
+        return lines
+
+    def poll(self):
+        if self.f is None and not self._open(): return []
+
+        lines = []
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            # 轮转过程中新文件尚未创建: 先读完旧文件
+            return self._read_new()
+
+        if st.st_ino != self.inode:
+            lines.extend(self._read_new())
+            if self.partial: lines.append(self.partial)
+            self.close()
+            if not self._open(): return lines
+        elif st.st_size < self.offset:
+            self.f.seek(0)
+            self.offset = 0
+            self.partial = ""
+
+        lines.extend(self._read_new())
+        return lines
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
@@ -0,0 +1,46 @@
+import os
+import time
+import pickle
+import argparse
+
+def year_seconds(year):
+    start = time.mktime(time.strptime(f"{year},01,01,00,00,00", '%Y,%m,%d,%H,%M,%S'))
+    end = time.mktime(time.strptime(f"{year + 1},01,01,00,00,00", '%Y,%m,%d,%H,%M,%S'))
+    return end - start
+
+def main():
+    argparser = argparse.ArgumentParser(description="Per-node utilization from {year}.bin")
+    argparser.add_argument('year', type=int)
+    argparser.add_argument('-b', '--bin', help='Data file, default {year}.bin')
+    argparser.add_argument('--node-cores', type=int, default=0,
+                           help='Cores per node; default is the largest per-job slot count seen on the node')
+    argparser.add_argument('--top', default=15, type=int)
+    args = argparser.parse_args()
+
+    data_path = args.bin or f"{args.year}.bin"
+    if not os.path.exists(data_path):
+        print(f"No data found: {data_path}"); return
+    with open(data_path, 'rb') as f: data = pickle.load(f)
+    nodes = data.get("all", {}).get('node')
+    if not nodes:
+        print("No node data in this file. Please re-run run.py"); return
+
+    period = year_seconds(args.year)
+    rows = []
+    for host, n in nodes.items():
+        cores = args.node_cores or n['max_slots'] or 1
+        util = n['core_seconds'] / (cores * period) * 100
+        rows.append((host, n['jobs'], n['core_seconds'] / 3600, util))
+    rows.sort(key=lambda r: r[3], reverse=True)
+
+    print(f"{len(rows)} nodes, {sum(r[2] for r in rows):,.1f} busy core-hours in {args.year}")
+    header = f"  {'Node':<16} {'Jobs':>10} {'Core-hours':>14} {'Util':>8}"
+    print("\n🔥 Hot nodes:"); print(header)
+    for host, jobs, ch, util in rows[:args.top]:
+        print(f"  {host:<16} {jobs:>10,} {ch:>14,.1f} {util:>7.1f}%")
+    print("\n🧊 Under-used nodes:"); print(header)
+    for host, jobs, ch, util in rows[::-1][:args.top]:
+        print(f"  {host:<16} {jobs:>10,} {ch:>14,.1f} {util:>7.1f}%")
+
+if __name__ == '__main__':
+    main()
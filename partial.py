@@ -0,0 +1,67 @@
+import os
+import zlib
+import pickle
+
+# --- 多节点 map/reduce 的中间结果文件 ---
+# map: 任意节点解析一部分日志，写出自描述的 partial 文件 (格式名、版本、年份、每个文件的解析结果)
+# reduce: 合并任意多个 partial 文件，按与单节点相同的文件顺序重放聚合，结果与单节点运行一致
+#
+# 中位数、分布、作业级去重与占用扫描都需要逐作业数据，预先聚合成计数无法精确合并，
+# 因此 partial 以 "文件指纹 -> 解析结果" 保存 (解析是最耗时的一步，重放聚合很便宜)。
+# 按指纹合并是集合并集: 满足结合律与交换律，同一文件出现在多个 partial 中也只计一次。
+PARTIAL_FORMAT = "annual-report-partial"
+PARTIAL_VERSION = 7
+
+def new_partial(year):
+    """
+    files: {指纹: {'paths': [内容相同的所有路径], 'jobs': 作业行 (数组元素压缩为组记录),
+                   'stats': JobStats (排队时间草图、Top-K 作业、异常基线)}}
+    """
+    return {'format': PARTIAL_FORMAT, 'version': PARTIAL_VERSION, 'year': year, 'files': {}}
+
+def add_file_result(partial, fingerprint, paths, jobs, stats):
+    entry = partial['files'].get(fingerprint)
+    if entry is None:
+        partial['files'][fingerprint] = {'paths': sorted(paths), 'jobs': jobs, 'stats': stats}
+    else:
+        entry['paths'] = sorted(set(entry['paths']) | set(paths))
+
+def merge_partials(dst, src):
+    """ 把 src 合并进 dst；内容相同的文件 (指纹相同) 只保留一份解析结果，路径取并集 """
+    if src['year'] != dst['year']:
+        raise ValueError(f"cannot merge partial results of {src['year']} into {dst['year']}")
+    for fp, entry in src['files'].items():
+        add_file_result(dst, fp, entry['paths'], entry['jobs'], entry['stats'])
+    return dst
+
+def ordered_results(partial):
+    """
+    按单节点运行的顺序返回 [(作业行, JobStats), ...]: 单节点对文件路径排序，内容相同的拷贝保留路径最小的一份
+    """
+    entries = sorted(partial['files'].values(), key=lambda e: e['paths'][0])
+    return [(e['jobs'], e['stats']) for e in entries]
+
+def shard_of(path, n_shards):
+    """ 按文件名 (不含目录) 分片；不能用内置 hash(): 各进程的字符串哈希种子不同 """
+    return zlib.crc32(os.path.basename(path).encode()) % n_shards
+
+def parse_shard(spec):
+    """ 'I/N' -> (I, N) """
+    i, n = (int(x) for x in spec.split('/'))
+    if not 0 <= i < n: raise ValueError(f"invalid shard {spec!r}, expected I/N with 0 <= I < N")
+    return i, n
+
+def write_partial(partial, path):
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, 'wb') as f:
+        pickle.dump(partial, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+def load_partial(path):
+    with open(path, 'rb') as f:
+        partial = pickle.load(f)
+    if not isinstance(partial, dict) or partial.get('format') != PARTIAL_FORMAT:
+        raise ValueError(f"{path} is not a partial result file")
+    if partial['version'] != PARTIAL_VERSION:
+        raise ValueError(f"{path}: unsupported partial version {partial['version']}")
+    return partial
@@ -0,0 +1,33 @@
+import os
+import pickle
+import argparse
+
+from cwd_trie import trie_top
+
+def main():
+    argparser = argparse.ArgumentParser(description="Top project directories by core-hours from {year}.bin")
+    argparser.add_argument('year', type=int)
+    argparser.add_argument('-b', '--bin', help='Data file, default {year}.bin')
+    argparser.add_argument('-u', '--user', default="all", help='User name; default the whole cluster')
+    argparser.add_argument('--depth', type=int, help='Roll deeper directories up to this depth')
+    argparser.add_argument('--top', default=20, type=int)
+    args = argparser.parse_args()
+
+    data_path = args.bin or f"{args.year}.bin"
+    if not os.path.exists(data_path):
+        print(f"No data found: {data_path}"); return
+    with open(data_path, 'rb') as f: data = pickle.load(f)
+    if args.user not in data:
+        print(f"User {args.user} not found"); return
+    trie = data[args.user].get('cwd')
+    if not trie:
+        print("No directory data in this file. Please re-run run.py"); return
+
+    total = trie['core_seconds'] or 1
+    print(f"{args.user}: {trie['core_seconds'] / 3600:,.1f} core-hours in {trie['jobs']:,} jobs ({args.year})")
+    print(f"  {'Directory':<60} {'Jobs':>10} {'Core-hours':>14} {'Share':>8}")
+    for path, cs, jobs in trie_top(trie, args.top, args.depth):
+        print(f"  {path:<60} {jobs:>10,} {cs / 3600:>14,.1f} {cs / total * 100:>7.1f}%")
+
+if __name__ == '__main__':
+    main()
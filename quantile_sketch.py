@@ -0,0 +1,81 @@
+import math
+import time
+
+# --- 可合并分位数草图 (Mergeable quantile sketch) ---
+# DDSketch 风格的对数分桶: 值 v 落入桶 ceil(log_gamma(v))，任意分位数的相对误差不超过 ALPHA。
+# 桶数只与取值范围有关 (0 ~ 1 年的秒数约 900 个桶)，与样本数无关；
+# 两个草图合并只需按桶累加计数，满足交换律与结合律，worker 端更新、父进程合并即可。
+# 草图本身是普通 dict，可直接写入 {year}.bin，annual-report.py 无需导入本模块也能读取。
+ALPHA = 0.01
+GAMMA = (1 + ALPHA) / (1 - ALPHA)
+_LOG_GAMMA = math.log(GAMMA)
+
+def sketch_new(alpha=ALPHA):
+    """ alpha: 相对误差；更大的 alpha 桶更少，适合数量很多、只需粗略分位数的草图 """
+    return {'alpha': alpha, 'count': 0, 'zero': 0, 'bins': {}}
+
+def sketch_add(sk, value, weight=1):
+    sk['count'] += weight
+    if value < 1:
+        sk['zero'] += weight
+        return
+    alpha = sk['alpha']
+    log_gamma = _LOG_GAMMA if alpha == ALPHA else math.log((1 + alpha) / (1 - alpha))
+    i = math.ceil(math.log(value) / log_gamma)
+    bins = sk['bins']
+    bins[i] = bins.get(i, 0) + weight
+
+def sketch_merge(dst, src):
+    """ 把 src 合并进 dst (原地修改并返回 dst) """
+    if dst['alpha'] != src['alpha']:
+        raise ValueError("Cannot merge sketches with different accuracy")
+    dst['count'] += src['count']
+    dst['zero'] += src['zero']
+    bins = dst['bins']
+    for i, c in src['bins'].items():
+        bins[i] = bins.get(i, 0) + c
+    return dst
+
+def sketch_quantile(sk, q):
+    """ q ∈ [0, 1]；空草图返回 None """
+    if sk['count'] == 0: return None
+    rank = q * (sk['count'] - 1)
+    seen = sk['zero']
+    if rank < seen: return 0.0
+    gamma = (1 + sk['alpha']) / (1 - sk['alpha'])
+    for i in sorted(sk['bins']):
+        seen += sk['bins'][i]
+        if rank < seen:
+            return 2 * gamma ** i / (gamma + 1)
+    return 2 * gamma ** max(sk['bins']) / (gamma + 1)
+
+def sketch_items(sk):
+    """ 按升序返回 [(桶代表值, 计数), ...]，小于 1 的取值代表值为 0 """
+    gamma = (1 + sk['alpha']) / (1 - sk['alpha'])
+    items = [(0.0, sk['zero'])] if sk['zero'] else []
+    items.extend((2 * gamma ** i / (gamma + 1), c) for i, c in sorted(sk['bins'].items()) if c)
+    return items
+
+def sketch_summary(sk, quantiles=(0.5, 0.9, 0.99)):
+    """ {'count': n, 'p50': .., 'p90': .., 'p99': ..} """
+    res = {'count': sk['count']}
+    for q in quantiles:
+        v = sketch_quantile(sk, q)
+        res[f"p{round(q * 100):g}"] = round(v, 1) if v is not None else None
+    return res
+
+def add_wait_sketch(wait_sketch, job, weight=1):
+    """ 每队列每月的排队时间分位数草图 {queue: {month: sketch}}；weight=-1 撤销一次已计入的作业 """
+    queue, sub_ts, wait = job[1], job[2], job[5]
+    month = time.strftime('%m', time.localtime(sub_ts))
+    q_sketch = wait_sketch.setdefault(queue, {})
+    if month not in q_sketch: q_sketch[month] = sketch_new()
+    sketch_add(q_sketch[month], wait, weight)
+
+def merge_wait_sketch(dst, src):
+    for queue, months in src.items():
+        q_sketch = dst.setdefault(queue, {})
+        for month, sk in months.items():
+            if month in q_sketch: sketch_merge(q_sketch[month], sk)
+            else: q_sketch[month] = sk
+    return dst
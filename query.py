@@ -0,0 +1,236 @@
+import os
+import time
+import pickle
+import argparse
+import bisect
+from array import array
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，缺失时退回逐行过滤
+    np = None
+
+# --- 作业索引 (Job Index) ---
+# run.py 在生成 {year}.bin 的同时写出 {year}.idx：
+# 全部作业按提交时间排序后按列存储 (array.array)，字符串列用字典编码，
+# 查询时只需 bisect 定位时间窗口，再在窗口内做过滤与聚合，无需重新扫描日志。
+INDEX_VERSION = 1
+
+def _encode(table, lookup, value):
+    code = lookup.get(value)
+    if code is None:
+        code = len(table)
+        table.append(value)
+        lookup[value] = code
+    return code
+
+class JobIndexBuilder:
+    """ 逐行追加作业，build() 时再按提交时间排序；--max-memory 模式下无需持有完整作业行 """
+    def __init__(self):
+        self.users, self.queues, self.softwares = [], [], []
+        self._u_lut, self._q_lut, self._s_lut = {}, {}, {}
+        self.cols = {
+            'sub_ts': array('q'), 'user': array('I'), 'queue': array('I'), 'software': array('I'),
+            'cores': array('i'), 'wait': array('q'), 'run': array('q'), 'cpu': array('d'),
+        }
+
+    def add(self, job):
+        """ job: [user, queue, sub_ts, cores, software, wait, run, cpu, ...] """
+        user, queue, sub_ts, cores, soft, wait, run, cpu = job[:8]
+        cols = self.cols
+        cols['sub_ts'].append(int(sub_ts))
+        cols['user'].append(_encode(self.users, self._u_lut, user))
+        cols['queue'].append(_encode(self.queues, self._q_lut, queue))
+        cols['software'].append(_encode(self.softwares, self._s_lut, soft))
+        cols['cores'].append(cores)
+        cols['wait'].append(wait)
+        cols['run'].append(run)
+        cols['cpu'].append(cpu)
+
+    def build(self):
+        """ 各列按提交时间稳定排序；numpy 的 argsort 每行只占 8 字节，不为每行创建 Python 整数 """
+        sub_ts = self.cols['sub_ts']
+        idx = {'version': INDEX_VERSION, 'users': self.users, 'queues': self.queues, 'softwares': self.softwares}
+        if np is not None:
+            order = np.argsort(np.frombuffer(sub_ts, dtype=sub_ts.typecode), kind='stable')
+            for name, col in self.cols.items():
+                idx[name] = array(col.typecode, np.frombuffer(col, dtype=col.typecode)[order].tobytes())
+            return idx
+        order = sorted(range(len(sub_ts)), key=sub_ts.__getitem__)
+        for name, col in self.cols.items():
+            idx[name] = array(col.typecode, (col[i] for i in order))
+        return idx
+
+def build_job_index(raw_data):
+    """ raw_data: [user, queue, sub_ts, cores, software, wait, run, cpu, ...] 列表 """
+    builder = JobIndexBuilder()
+    for job in raw_data:
+        builder.add(job)
+    return builder.build()
+
+def write_job_index(raw_data, path):
+    """ raw_data 为作业行列表或 JobIndexBuilder """
+    idx = raw_data.build() if isinstance(raw_data, JobIndexBuilder) else build_job_index(raw_data)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(idx, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return idx
+
+def load_job_index(path):
+    with open(path, 'rb') as f:
+        idx = pickle.load(f)
+    if idx.get('version') != INDEX_VERSION:
+        raise ValueError(f"Unsupported index version in {path}: {idx.get('version')}")
+    return idx
+
+def _codes(table, names):
+    """ 名称集合 -> 编码集合；None 表示不过滤 """
+    if not names: return None
+    names = set(names)
+    return {i for i, v in enumerate(table) if v in names}
+
+def empty_result():
+    return {
+        'jobs_count': 0, 'runtime_sum': 0, 'cpu_time_sum': 0.0, 'wait_time_sum': 0,
+        'core_seconds': 0, 'user': {}, 'queue': {}, 'software': {},
+    }
+
+def query_job_index(idx, since=None, until=None, users=None, queues=None, softwares=None):
+    """ 在 [since, until] 提交时间窗口内按 用户/队列/软件 过滤并聚合 """
+    sub_ts = idx['sub_ts']
+    lo = 0 if since is None else bisect.bisect_left(sub_ts, since)
+    hi = len(sub_ts) if until is None else bisect.bisect_right(sub_ts, until)
+
+    u_set = _codes(idx['users'], users)
+    q_set = _codes(idx['queues'], queues)
+    s_set = _codes(idx['softwares'], softwares)
+
+    res = empty_result()
+    if lo >= hi: return res
+    if (u_set is not None and not u_set) or (q_set is not None and not q_set) or (s_set is not None and not s_set):
+        return res
+
+    if np is not None:
+        totals, by_user, by_queue, by_soft = _aggregate_numpy(idx, lo, hi, u_set, q_set, s_set)
+    else:
+        totals, by_user, by_queue, by_soft = _aggregate_python(idx, lo, hi, u_set, q_set, s_set)
+    res.update(totals)
+    res.update({
+        'user': {idx['users'][k]: v for k, v in by_user.items()},
+        'queue': {idx['queues'][k]: v for k, v in by_queue.items()},
+        'software': {idx['softwares'][k]: v for k, v in by_soft.items()},
+    })
+    return res
+
+def _column(idx, name, lo, hi):
+    """ array.array 列的零拷贝 numpy 视图 """
+    col = idx[name]
+    return np.frombuffer(col, dtype=col.typecode)[lo:hi]
+
+def _core_seconds_by(codes, cs, mask):
+    """ 按编码分组的核秒合计 {编码: 核秒}；窗口内出现过的编码都保留 (核秒可能为 0) """
+    codes = codes[mask]
+    counts = np.bincount(codes)
+    sums = np.bincount(codes, weights=cs[mask])
+    return {int(k): int(sums[k]) for k in np.flatnonzero(counts)}
+
+def _aggregate_numpy(idx, lo, hi, u_set, q_set, s_set):
+    """ 编码列上用 isin 生成过滤掩码，按用户/队列/软件的核秒用 bincount 一次算出 """
+    u, q, s = _column(idx, 'user', lo, hi), _column(idx, 'queue', lo, hi), _column(idx, 'software', lo, hi)
+    mask = np.ones(hi - lo, dtype=bool)
+    for codes, wanted in ((u, u_set), (q, q_set), (s, s_set)):
+        if wanted is not None: mask &= np.isin(codes, list(wanted))
+    run = _column(idx, 'run', lo, hi)
+    cs = run * _column(idx, 'cores', lo, hi)
+    totals = {
+        'jobs_count': int(np.count_nonzero(mask)), 'runtime_sum': int(run[mask].sum()),
+        'cpu_time_sum': float(_column(idx, 'cpu', lo, hi)[mask].sum()),
+        'wait_time_sum': int(_column(idx, 'wait', lo, hi)[mask].sum()), 'core_seconds': int(cs[mask].sum()),
+    }
+    return totals, _core_seconds_by(u, cs, mask), _core_seconds_by(q, cs, mask), _core_seconds_by(s, cs, mask)
+
+def _aggregate_python(idx, lo, hi, u_set, q_set, s_set):
+    by_user, by_queue, by_soft = {}, {}, {}
+    jobs = 0; run_sum = 0; cpu_sum = 0.0; wait_sum = 0; core_sec = 0
+    cols = zip(idx['user'][lo:hi], idx['queue'][lo:hi], idx['software'][lo:hi],
+               idx['cores'][lo:hi], idx['wait'][lo:hi], idx['run'][lo:hi], idx['cpu'][lo:hi])
+    for u, q, s, cores, wait, run, cpu in cols:
+        if u_set is not None and u not in u_set: continue
+        if q_set is not None and q not in q_set: continue
+        if s_set is not None and s not in s_set: continue
+        cs = run * cores
+        jobs += 1; run_sum += run; cpu_sum += cpu; wait_sum += wait; core_sec += cs
+        by_user[u] = by_user.get(u, 0) + cs
+        by_queue[q] = by_queue.get(q, 0) + cs
+        by_soft[s] = by_soft.get(s, 0) + cs
+    totals = {'jobs_count': jobs, 'runtime_sum': run_sum, 'cpu_time_sum': cpu_sum,
+              'wait_time_sum': wait_sum, 'core_seconds': core_sec}
+    return totals, by_user, by_queue, by_soft
+
+def merge_query_results(results):
+    """ 合并多个索引文件 (跨年区间) 的查询结果 """
+    total = empty_result()
+    for r in results:
+        for k in ('jobs_count', 'runtime_sum', 'cpu_time_sum', 'wait_time_sum', 'core_seconds'):
+            total[k] += r[k]
+        for k in ('user', 'queue', 'software'):
+            for name, v in r[k].items():
+                total[k][name] = total[k].get(name, 0) + v
+    return total
+
+def parse_date(date_str, end_of_day=False):
+    """ YYYY-MM-DD -> 本地时间戳 """
+    ts = time.mktime(time.strptime(date_str, '%Y-%m-%d'))
+    return int(ts) + 86399 if end_of_day else int(ts)
+
+def split_names(value):
+    if not value: return None
+    return [v for v in value.split(',') if v]
+
+def print_breakdown(title, counter, top):
+    if not counter: return
+    print(f"\n{title} (core-hours):")
+    for name, cs in sorted(counter.items(), key=lambda kv: kv[1], reverse=True)[:top]:
+        print(f"  {name:<24} {cs / 3600:>14,.1f}")
+
+def main():
+    argparser = argparse.ArgumentParser(description="Query job index ({year}.idx) without re-parsing logs")
+    argparser.add_argument('-i', '--index', nargs='+', required=True, help='One or more {year}.idx files')
+    argparser.add_argument('--since', help='Submit date from, YYYY-MM-DD (inclusive)')
+    argparser.add_argument('--until', help='Submit date to, YYYY-MM-DD (inclusive)')
+    argparser.add_argument('-u', '--users', help='Comma separated user list')
+    argparser.add_argument('-q', '--queues', help='Comma separated queue list')
+    argparser.add_argument('-s', '--software', help='Comma separated software list')
+    argparser.add_argument('--top', default=10, type=int, help='Rows shown per breakdown')
+    args = argparser.parse_args()
+
+    start_t = time.time()
+    since = parse_date(args.since) if args.since else None
+    until = parse_date(args.until, end_of_day=True) if args.until else None
+    users = split_names(args.users)
+    queues = split_names(args.queues)
+    softwares = split_names(args.software)
+
+    results = []
+    for path in args.index:
+        if not os.path.exists(path):
+            print(f"Warning: {path} not found, skipped."); continue
+        idx = load_job_index(path)
+        results.append(query_job_index(idx, since, until, users, queues, softwares))
+    res = merge_query_results(results)
+
+    print(f"Jobs:         {res['jobs_count']:,}")
+    print(f"Walltime:     {res['runtime_sum'] / 3600:,.1f} h")
+    print(f"CPU time:     {res['cpu_time_sum'] / 3600:,.1f} h")
+    print(f"Core-hours:   {res['core_seconds'] / 3600:,.1f}")
+    if res['jobs_count']:
+        print(f"Mean wait:    {res['wait_time_sum'] / res['jobs_count'] / 3600:,.2f} h")
+    if res['core_seconds']:
+        print(f"Efficiency:   {res['cpu_time_sum'] / res['core_seconds'] * 100:.2f}%")
+    print_breakdown("By queue", res['queue'], args.top)
+    print_breakdown("By software", res['software'], args.top)
+    print_breakdown("By user", res['user'], args.top)
+    print(f"\nQuery took {time.time() - start_t:.3f}s")
+
+if __name__ == '__main__':
+    main()
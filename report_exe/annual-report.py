@@ -1,7 +1,92 @@
 #!/usr/bin/env python3
 import os
+import io
+import sys
+import json
+import time
+import shutil
+import signal
+import socket
+import struct
 import pickle
+import hashlib
 import argparse
+import threading
+import socketserver
+import multiprocessing
+from functools import partial
+from collections import OrderedDict
+
+# 路径请根据实际情况修改
+DATA_DIR = "/share/Pub/ylzhao/annual-report/data"
+# DATA_DIR = "."
+
+# --- 常驻报告服务 (--serve) ---
+# 登录节点上的本地守护进程: 数据只加载一次常驻内存，按 Unix socket 对端凭据 (SO_PEERCRED) 确认调用者身份，
+# 渲染结果放入 LRU 缓存。查看器先尝试连接服务，连上时只需一次 socket 往返，
+# 不必导入 rich、读取并反序列化共享存储上的数据文件；连不上则照常直接加载。
+# socket 放在管理员所有、其他用户不可写的目录中 (不能用 /tmp: 任何人都能抢先占用该路径冒充服务)；
+# 查看器还要确认对端进程属于 root 或数据文件的属主，否则不信任其输出，改为直接加载。
+SOCKET_PATH = "/run/annual-report/annual-report-{year}.sock"
+DAEMON_CONNECT_TIMEOUT = 0.5
+DAEMON_TIMEOUT = 30
+DAEMON_CACHE_SIZE = 256
+
+def build_argparser():
+    argparser = argparse.ArgumentParser(description="你的年度报告")
+    argparser.add_argument("year", type=int)
+    argparser.add_argument("--prerender", action="store_true", help="(管理员) 为全部用户预渲染报告到缓存目录")
+    argparser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="预渲染进程数")
+    argparser.add_argument("--html", action="store_true", help="预渲染时额外输出 HTML")
+    argparser.add_argument("--width", type=int, default=None, help="预渲染宽度 (默认 80 与 120 各一份)")
+    argparser.add_argument("--top", type=int, default=0, metavar="N", help="附加显示各指标前 N 名作业")
+    argparser.add_argument("--serve", action="store_true", help="(管理员) 以常驻服务运行，通过 Unix socket 提供报告")
+    argparser.add_argument("--socket", help=f"常驻服务的 socket 路径，默认 {SOCKET_PATH}")
+    argparser.add_argument("--cache-size", type=int, default=DAEMON_CACHE_SIZE, help="常驻服务缓存的报告数")
+    argparser.add_argument("--no-daemon", action="store_true", help="不连接常驻服务，直接加载数据")
+    return argparser
+
+def peer_uid(sock):
+    """ Unix socket 对端进程的 uid (内核提供，调用者无法伪造) """
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    pid, uid, gid = struct.unpack("3i", creds)
+    return uid
+
+def request_from_daemon(socket_path, data_path, year, width, plain, top):
+    """ 向常驻服务请求当前用户的报告；服务不可用、出错或对端既不是 root 也不是数据文件属主时返回 None """
+    if not hasattr(socket, "SO_PEERCRED"): return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(DAEMON_CONNECT_TIMEOUT)
+            sock.connect(socket_path)
+            if peer_uid(sock) not in (0, os.stat(data_path).st_uid): return None
+            sock.settimeout(DAEMON_TIMEOUT)
+            req = {"year": year, "width": width, "plain": plain, "top": top}
+            sock.sendall(json.dumps(req).encode() + b"\n")
+            with sock.makefile("rb") as f:
+                header = json.loads(f.readline())
+                if not header.get("ok"): return None
+                body = f.read(header["length"])
+            if len(body) != header["length"]: return None
+            return body.decode("utf-8")
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _try_daemon():
+    """ 在导入 rich 之前尝试常驻服务，命中则输出并退出 """
+    args = build_argparser().parse_args()
+    if args.prerender or args.serve or args.no_daemon: return
+    plain = not sys.stdout.isatty()
+    width = args.width or shutil.get_terminal_size().columns
+    text = request_from_daemon(args.socket or SOCKET_PATH.format(year=args.year),
+                               os.path.join(DATA_DIR, f"{args.year}.bin"), args.year, width, plain, args.top)
+    if text is not None:
+        sys.stdout.write(text); sys.stdout.flush()
+        sys.exit(0)
+
+if __name__ == "__main__":
+    _try_daemon()
+
 from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
@@ -11,6 +96,25 @@ from rich.bar import Bar
 
 console = Console()
 
+# 预渲染缓存: {cache_dir}/{user}.{width}.ansi|.txt、{user}.html 与记录数据指纹的 _meta.json
+# 按几种宽度各渲染一份，查看时取不超过终端宽度的最宽一份 (非终端输出按 80 列)
+CACHE_META = "_meta.json"
+RENDER_WIDTHS = (80, 120)
+RENDER_WIDTH = RENDER_WIDTHS[-1]
+# run.py 维护的跨年份汇总索引 {user: {year: 概要}}，"历年记录" 只读这一个文件
+HISTORY_FILE = "history.bin"
+
+def load_history(history_path):
+    """ 整个历史索引；文件不存在时为空 """
+    if not os.path.exists(history_path): return {}
+    with open(history_path, "rb") as f: return pickle.load(f)
+
+def file_stat(path):
+    """ (size, mtime_ns)，文件不存在时为 None """
+    try: st = os.stat(path)
+    except OSError: return None
+    return [st.st_size, st.st_mtime_ns]
+
 def format_duration(seconds):
     if seconds is None: return "0s"
     seconds = float(seconds)
@@ -158,6 +262,112 @@ def draw_dual_metric_histogram(dist_dict, u_mean, u_med, c_mean, c_med, title):
         
     return table
 
+def draw_wait_quantile_table(wait_quantiles, queues):
+    """
+    绘制各队列逐月排队时间分位数 (p50 / p90 / p99)
+    wait_quantiles: {queue: {month: {'count', 'p50', 'p90', 'p99'}}}
+    """
+    table = Table(box=None, show_header=True, expand=True, padding=(0,1))
+    table.add_column("月份 (Month)", width=12, style="dim")
+    for q in queues:
+        table.add_column(f"{q} (p50/p90/p99)", ratio=1)
+
+    for i in range(1, 13):
+        m_key = str(i).zfill(2)
+        row = [f"{i}月"]
+        for q in queues:
+            s = wait_quantiles.get(q, {}).get(m_key)
+            if not s or not s.get('count'):
+                row.append("[dim]-[/dim]")
+                continue
+            row.append(f"[green]{format_duration(s['p50'])}[/green] / "
+                       f"[yellow]{format_duration(s['p90'])}[/yellow] / "
+                       f"[red]{format_duration(s['p99'])}[/red]")
+        table.add_row(*row)
+    return table
+
+TOP_JOB_SECTIONS = (
+    ('core_hours', "💰 核时最多 (Core-hours)", lambda j: f"{j['core_hours']:,.1f} 核时"),
+    ('runtime', "⏱️ 运行最久 (Walltime)", lambda j: format_duration(j['runtime'])),
+    ('wait', "⏳ 排队最久 (Pending)", lambda j: format_duration(j['wait'])),
+    ('worst_eff', "🐢 效率最低 (Efficiency)", lambda j: f"{j['efficiency']}%"),
+)
+
+def draw_top_jobs_table(jobs, value_fmt):
+    """ jobs: [{'job_id', 'array_idx', 'name', 'queue', 'cores', 'sub', 'start', 'end', ...}, ...] 已按名次排序 """
+    table = Table(box=None, show_header=True, expand=True, padding=(0,1))
+    table.add_column("#", width=3, style="dim")
+    table.add_column("作业号", width=14)
+    table.add_column("名称", ratio=1, overflow="ellipsis", no_wrap=True)
+    table.add_column("队列", width=10)
+    table.add_column("核数", justify="right", width=6)
+    table.add_column("提交 → 结束", width=25, style="dim")
+    table.add_column("数值", justify="right", width=14, style="bold")
+    for i, j in enumerate(jobs, 1):
+        jid = f"{j['job_id']}[{j['array_idx']}]" if j['array_idx'] else str(j['job_id'])
+        span = f"{time.strftime('%m-%d %H:%M', time.localtime(j['sub']))} → {time.strftime('%m-%d %H:%M', time.localtime(j['end']))}"
+        table.add_row(str(i), jid, j['name'] or "-", j['queue'], str(j['cores']), span, value_fmt(j))
+    return table
+
+def draw_waste_table(waste, n=5):
+    """ waste: {software: 计数 (核秒)}；按浪费的核时 (EXIT + 低效) 取前 n 个软件 """
+    rows = sorted(waste.items(), key=lambda kv: kv[1]['exit_core_seconds'] + kv[1]['low_eff_core_seconds'], reverse=True)
+    table = Table(box=None, show_header=True, expand=True, padding=(0,1))
+    table.add_column("软件", ratio=1)
+    table.add_column("核时", justify="right", width=12)
+    table.add_column("加权效率", justify="right", width=10)
+    table.add_column("失败 (EXIT)", justify="right", width=20)
+    table.add_column("低效", justify="right", width=20)
+    for soft, w in rows[:n]:
+        if not w['exit_core_seconds'] and not w['low_eff_core_seconds']: break
+        eff = w['cpu_seconds'] / w['core_seconds'] * 100 if w['core_seconds'] else 0
+        table.add_row(f"[cyan]{soft}[/cyan]", f"{w['core_seconds'] / 3600:,.1f}", f"{eff:.1f}%",
+                      f"[red]{w['exit_core_seconds'] / 3600:,.1f}[/red] ({w['exit_jobs']:,})",
+                      f"[yellow]{w['low_eff_core_seconds'] / 3600:,.1f}[/yellow] ({w['low_eff_jobs']:,})")
+    return table
+
+def draw_group_table(ud, groups):
+    """ 用户所属各级组的总量、用户占比与组内排名 (名次/人数) """
+    table = Table(box=None, show_header=True, expand=True, padding=(0,1))
+    table.add_column("组", ratio=1)
+    table.add_column("成员", justify="right", width=6)
+    table.add_column("组核时", justify="right", width=14)
+    table.add_column("你的占比", justify="right", width=9)
+    table.add_column("核时排名", justify="right", width=9)
+    table.add_column("作业数排名", justify="right", width=10)
+    table.add_column("加权效率", justify="right", width=16)
+    table.add_column("效率排名", justify="right", width=9)
+    u_cs = ud['waste_total']['core_seconds']
+    for group in ud['groups']:
+        gd = groups.get(group)
+        if gd is None: continue
+        ranks = ud.get('group_ranks', {}).get(group, {})
+        n = len(gd['members'])
+        g_cs = gd['waste_total']['core_seconds']
+        def rank(metric): return f"{ranks[metric]}/{n}" if metric in ranks else "-"
+        table.add_row(f"[cyan]{group}[/cyan]", str(n), f"{g_cs / 3600:,.1f}",
+                      f"{u_cs / g_cs * 100:.1f}%" if g_cs else "-",
+                      rank('core_hours'), rank('jobs_count'),
+                      f"{ud['waste_total']['weighted_efficiency']}% [dim]/ {gd['waste_total']['weighted_efficiency']}%[/dim]",
+                      rank('weighted_efficiency'))
+    return table
+
+def draw_history_table(history, year):
+    """ history: {year: 概要}，按年份排列，当前年份高亮 """
+    table = Table(box=None, show_header=True, expand=True, padding=(0,1))
+    table.add_column("年份", width=6)
+    table.add_column("作业数", justify="right", width=10)
+    table.add_column("运行时长", justify="right", width=12)
+    table.add_column("CPU核时", justify="right", width=12)
+    table.add_column("效率", justify="right", width=8)
+    table.add_column("常用软件", ratio=1)
+    for y in sorted(history):
+        h = history[y]
+        style = "bold yellow" if y == year else None
+        table.add_row(str(y), f"{h['jobs_count']:,}", format_duration(h['runtime_sum']), format_duration(h['cpu_time_sum']),
+                      f"{h['mean_efficiency']}%", h['top_software'] or "-", style=style)
+    return table
+
 def find_outlier_users(data):
     longest_job_user = "Unknown"; longest_job_time = 0
     longest_wait_user = "Unknown"; longest_wait_time = 0
@@ -183,25 +393,191 @@ def get_star_user_and_val(data, key):
         except: continue
     return star_user, max_val
 
-def main():
-    argparser = argparse.ArgumentParser(description="你的年度报告")
-    argparser.add_argument("year", type=int)
-    args = argparser.parse_args()
-    username = os.popen("whoami").read().strip()
-    
-    # 路径请根据实际情况修改
-    data_path = f"/share/Pub/ylzhao/annual-report/data/{args.year}.bin"
-    # data_path = f"{args.year}.bin"
+def data_fingerprint(data_path):
+    """ 数据文件的 sha256 """
+    h = hashlib.sha256()
+    with open(data_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
 
-    if not os.path.exists(data_path):
-        console.print(f"[red]No data found for {args.year}[/red]"); os._exit(1)
-    with open(data_path, "rb") as f: data = pickle.load(f)
-    if username not in data: console.print(f"[red]User {username} not found[/red]"); os._exit(1)
+def load_cached_report(cache_dir, data_path, history_path, username, width, plain):
+    """
+    缓存命中则返回预渲染的报告文本，否则返回 None
+    先比较数据文件的 (size, mtime)，一致时直接信任记录的哈希；不一致再重新计算哈希比对
+    历史索引 (其他年份重新运行后会变化) 只比较 (size, mtime)
+    """
+    meta_path = os.path.join(cache_dir, CACHE_META)
+    if not os.path.exists(meta_path): return None
+    try:
+        with open(meta_path) as f: meta = json.load(f)
+        fits = [w for w in meta['widths'] if w <= width]
+        if not fits: return None
+        report_path = os.path.join(cache_dir, f"{username}.{max(fits)}.{'txt' if plain else 'ansi'}")
+        st = os.stat(data_path)
+        if [st.st_size, st.st_mtime_ns] != meta['stat'] and data_fingerprint(data_path) != meta['sha256']:
+            return None
+        if file_stat(history_path) != meta.get('history_stat'): return None
+        with open(report_path, encoding="utf-8") as f: return f.read()
+    except (OSError, ValueError, KeyError):
+        return None
+
+_DATA = None
+_HISTORY = None
+
+def _init_render_worker(data_path, history_path):
+    global _DATA, _HISTORY
+    with open(data_path, "rb") as f: _DATA = pickle.load(f)
+    _HISTORY = load_history(history_path)
+
+def _render_user_to_files(username, year, cache_dir, widths, html):
+    outputs = {}
+    for width in widths:
+        buf = io.StringIO()
+        c = Console(file=buf, record=True, width=width, force_terminal=True, color_system="256")
+        render_report(c, _DATA, username, year, history=_HISTORY.get(username))
+        outputs[f"{width}.ansi"] = buf.getvalue()
+        outputs[f"{width}.txt"] = c.export_text(clear=False)
+    # HTML 由浏览器排版，只保留最宽的一份
+    if html: outputs["html"] = c.export_html()
+    for ext, content in outputs.items():
+        path = os.path.join(cache_dir, f"{username}.{ext}")
+        with open(path + ".tmp", "w", encoding="utf-8") as f: f.write(content)
+        os.replace(path + ".tmp", path)
+    return username
+
+def prerender_all(data_path, history_path, cache_dir, year, jobs, widths, html):
+    """ (管理员) 用进程池为全部用户预渲染报告: 每个宽度一份 {user}.{width}.ansi / .txt，可选 {user}.html """
+    with open(data_path, "rb") as f: users = [u for u in pickle.load(f) if u != "all"]
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_path = os.path.join(cache_dir, CACHE_META)
+    # 渲染期间先移除旧的 meta，避免查看器把新旧混杂的缓存当作有效
+    if os.path.exists(meta_path): os.remove(meta_path)
+
+    st = os.stat(data_path)
+    sha = data_fingerprint(data_path)
+    history_stat = file_stat(history_path)
+    console.print(f"Rendering {len(users)} reports with {jobs} processes -> {cache_dir}")
+    widths = sorted(widths)
+    func = partial(_render_user_to_files, year=year, cache_dir=cache_dir, widths=widths, html=html)
+    with multiprocessing.Pool(jobs, initializer=_init_render_worker, initargs=(data_path, history_path)) as pool:
+        for n, _ in enumerate(pool.imap_unordered(func, users, chunksize=8), 1):
+            if n % 100 == 0: console.print(f"  {n}/{len(users)}")
+
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump({"sha256": sha, "stat": [st.st_size, st.st_mtime_ns], "history_stat": history_stat,
+                   "widths": widths, "year": year}, f)
+    os.replace(meta_path + ".tmp", meta_path)
+    console.print(f"Done. {len(users)} reports rendered.")
+
+def render_to_text(data, username, year, width, plain, top=0, history=None):
+    """ 渲染到字符串: plain 为纯文本，否则带 ANSI 颜色 """
+    buf = io.StringIO()
+    c = Console(file=buf, width=width, force_terminal=not plain, color_system=None if plain else "256")
+    render_report(c, data, username, year, top, history)
+    return buf.getvalue()
+
+class ReportService:
+    """ 常驻内存的数据 + 渲染结果的 LRU 缓存；数据文件或历史索引 (size, mtime) 变化时自动重新加载并清空缓存 """
+    def __init__(self, data_path, history_path, year, cache_size):
+        self.data_path = data_path
+        self.history_path = history_path
+        self.year = year
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.data = None
+        self.history = None
+        self.stat = None
+        self._reload_if_changed()
 
+    def _reload_if_changed(self):
+        st = os.stat(self.data_path)
+        key = (st.st_size, st.st_mtime_ns, file_stat(self.history_path))
+        if key == self.stat: return
+        with open(self.data_path, "rb") as f: data = pickle.load(f)
+        self.data, self.history, self.stat = data, load_history(self.history_path), key
+        self.cache.clear()
+        console.print(f"Loaded {self.data_path}: {len(data) - 1} users")
+
+    def render(self, username, width, plain, top):
+        key = (username, width, plain, top)
+        with self.lock:
+            self._reload_if_changed()
+            text = self.cache.get(key)
+            if text is not None:
+                self.cache.move_to_end(key)
+                return text
+            data, history = self.data, self.history
+        if username not in data: return None
+        # 渲染在锁外进行，多个请求可并发
+        text = render_to_text(data, username, self.year, width, plain, top, history.get(username)).encode("utf-8")
+        with self.lock:
+            self.cache[key] = text
+            while len(self.cache) > self.cache_size: self.cache.popitem(last=False)
+        return text
+
+class _ReportHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        import pwd
+        service = self.server.service
+        try:
+            username = pwd.getpwuid(peer_uid(self.request)).pw_name
+            req = json.loads(self.rfile.readline(4096))
+            if req.get("year") != service.year: raise ValueError(f"this service only serves {service.year}")
+            width = min(max(int(req.get("width", RENDER_WIDTH)), 40), 400)
+            top = min(max(int(req.get("top", 0)), 0), 50)
+            text = service.render(username, width, bool(req.get("plain")), top)
+            if text is None: raise KeyError(f"User {username} not found")
+            header = {"ok": True, "length": len(text)}
+        except Exception as e:
+            text = b""
+            header = {"ok": False, "error": str(e)}
+        self.wfile.write(json.dumps(header).encode() + b"\n" + text)
+
+def serve(data_path, history_path, year, socket_path, cache_size):
+    """ (管理员) 运行常驻服务；所有用户都可连接，但只能拿到对端凭据对应用户自己的报告 """
+    if not hasattr(socket, "SO_PEERCRED"):
+        console.print("[red]--serve needs SO_PEERCRED (Linux)[/red]"); os._exit(1)
+    socket_dir = os.path.dirname(os.path.abspath(socket_path))
+    os.makedirs(socket_dir, mode=0o755, exist_ok=True)
+    if os.stat(socket_dir).st_mode & 0o022:
+        # 其他用户可写的目录里，socket 文件可被删除或替换
+        console.print(f"[red]{socket_dir} is writable by other users, put the socket in an admin-owned 0755 directory[/red]")
+        os._exit(1)
+    if os.path.exists(socket_path):
+        # 上次未正常退出留下的 socket 文件: 连不上才删除，避免抢占正在运行的服务
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s: s.connect(socket_path)
+            console.print(f"[red]A service is already listening on {socket_path}[/red]"); os._exit(1)
+        except OSError:
+            os.remove(socket_path)
+
+    service = ReportService(data_path, history_path, year, cache_size)
+    server = socketserver.ThreadingUnixStreamServer(socket_path, _ReportHandler)
+    server.daemon_threads = True
+    server.service = service
+    os.chmod(socket_path, 0o666)
+    # 被 kill / systemd 停止时也走 finally 清理 socket 文件
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    console.print(f"Serving {year} reports on {socket_path} (Ctrl-C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+
+def render_report(console, data, username, year, top=0, history=None):
+    """
+    渲染单个用户的完整报告到 console；top > 0 时附加各指标前 top 名作业
+    history: 该用户的历年概要 {year: 概要}，来自 history.bin
+    """
     ud = data[username]; ad = data["all"]
 
     # 1. Header
-    console.print(Panel(Align.center(f"[bold magenta]✨ {args.year} HPC Cluster Annual Report ✨[/bold magenta]\nUser: {username}"), border_style="magenta"))
+    console.print(Panel(Align.center(f"[bold magenta]✨ {year} HPC Cluster Annual Report ✨[/bold magenta]\nUser: {username}"), border_style="magenta"))
 
     # 2. Key Metrics
     u_eff = ud.get('mean_efficiency', 0)
@@ -253,6 +629,51 @@ def main():
 
     console.print("")
 
+    # 队列排队分位数: 展示用户最常用的 (最多 3 个) 队列
+    wait_quantiles = ad.get('wait_quantiles')
+    if wait_quantiles and ud['queue']:
+        my_queues = [q for q in sorted(ud['queue'], key=ud['queue'].get, reverse=True) if q in wait_quantiles][:3]
+        if my_queues:
+            console.print("[bold]⏳ 常用队列排队时间分位数 (Queue Pending Percentiles)[/bold]")
+            console.print(draw_wait_quantile_table(wait_quantiles, my_queues))
+            console.print("")
+
+    # 核时最多的工作目录 (按作业 cwd 汇总，"<other>" 为折叠的小目录)
+    top_dirs = ud.get('top_dirs')
+    if top_dirs:
+        console.print("[bold]📁 核时最多的目录 (Top Directories)[/bold]")
+        total_cs = ud['cwd']['core_seconds'] or 1
+        t_dirs = Table(box=None, show_header=True, expand=True, padding=(0,1))
+        t_dirs.add_column("目录", ratio=1, overflow="fold")
+        t_dirs.add_column("作业数", justify="right", width=10)
+        t_dirs.add_column("核时", justify="right", width=14)
+        t_dirs.add_column("占比", justify="right", width=8)
+        for path, cs, jobs in top_dirs[:5]:
+            t_dirs.add_row(f"[cyan]{path}[/cyan]", f"{jobs:,}", f"{cs / 3600:,.1f}", f"{cs / total_cs * 100:.1f}%")
+        console.print(t_dirs); console.print("")
+
+    # 所属课题组/院系 (run.py --groups)
+    if ud.get('groups') and ad.get('groups'):
+        console.print("[bold]👥 所在组 (Groups)[/bold] [dim]加权效率: 你 / 组[/dim]")
+        console.print(draw_group_table(ud, ad['groups']))
+        console.print("")
+
+    # 浪费的核时: 失败 (EXIT) 作业与低效作业
+    u_waste = ud.get('waste_total')
+    if u_waste and u_waste['core_seconds']:
+        a_waste = ad['waste_total']
+        console.print("[bold]🗑️ 浪费的核时 (Wasted Core-hours)[/bold]")
+        u_cs = u_waste['core_seconds']; a_cs = a_waste['core_seconds'] or 1
+        console.print(
+            f"加权效率 [bold]{u_waste['weighted_efficiency']}%[/bold] [dim](集群 {a_waste['weighted_efficiency']}%)[/dim]   "
+            f"失败作业 [red]{u_waste['exit_core_seconds'] / 3600:,.1f}[/red] 核时 ({u_waste['exit_core_seconds'] / u_cs * 100:.1f}%) "
+            f"[dim](集群 {a_waste['exit_core_seconds'] / a_cs * 100:.1f}%)[/dim]   "
+            f"低效作业 [yellow]{u_waste['low_eff_core_seconds'] / 3600:,.1f}[/yellow] 核时 ({u_waste['low_eff_core_seconds'] / u_cs * 100:.1f}%) "
+            f"[dim](集群 {a_waste['low_eff_core_seconds'] / a_cs * 100:.1f}%)[/dim]")
+        if u_waste['exit_core_seconds'] or u_waste['low_eff_core_seconds']:
+            console.print(draw_waste_table(ud['waste']))
+        console.print("")
+
     # 5. Habits
     console.print("[bold]🕒 作业提交习惯[/bold]")
     period_labels = {"1-6":"01-06(夜)", "7-12":"07-12(晨)", "13-18":"13-18(午)", "19-24":"19-24(晚)"}
@@ -277,14 +698,33 @@ def main():
     my_max_wait = format_duration(ud.get('biggest_wait_time', 0))
     my_latest = format_time_hms(ud.get('latest_time', '000000'))
     my_holiday = ud.get('holiday_count', 0)
+    my_peak_cores = ud.get('peak_cores', 0)
+    my_peak_jobs = ud.get('peak_jobs', 0)
 
     console.print(Panel(
         f"💻 [bold]常用软件[/bold]: [green]{most_soft}[/green]   🏃 [bold]常用队列[/bold]: [yellow]{most_queue}[/yellow]\n"
         f"🦉 [bold]最晚提交[/bold]: {my_latest}   🏖️ [bold]假期内卷[/bold]: {my_holiday}\n"
-        f"⏳ [bold]最久运行[/bold]: {my_max_run}   🛑 [bold]最久排队[/bold]: {my_max_wait}",
+        f"⏳ [bold]最久运行[/bold]: {my_max_run}   🛑 [bold]最久排队[/bold]: {my_max_wait}\n"
+        f"🚀 [bold]峰值并发[/bold]: {my_peak_cores:,} 核 / {my_peak_jobs:,} 作业   [dim](集群峰值: {ad.get('peak_cores', 0):,} 核)[/dim]",
         title="🔍 用户画像", border_style="blue"
     ))
 
+    # 可选: 你的 Top 作业 (--top N)
+    top_jobs = ud.get('top_jobs')
+    if top and top_jobs:
+        console.print(f"\n[bold]🔝 你的 Top {top} 作业 (Top Jobs)[/bold]")
+        for metric, title, value_fmt in TOP_JOB_SECTIONS:
+            if not top_jobs.get(metric): continue
+            console.print(f"[bold]{title}[/bold]")
+            console.print(draw_top_jobs_table(top_jobs[metric][:top], value_fmt))
+    elif top:
+        console.print("\n[yellow]⚠️ No top-job data in this file. Please re-run run.py[/yellow]")
+
+    # 历年记录: 只在有往年数据时展示
+    if history and len(history) > 1:
+        console.print("\n[bold]📈 你的历年记录 (Your History)[/bold]")
+        console.print(draw_history_table(history, year))
+
     # 7. Hall of Fame
     console.print("\n[bold magenta]🏆 荣耀榜 (Hall of Fame)[/bold magenta]")
     (lj_u, lj_v), (lw_u, lw_v) = find_outlier_users(data)
@@ -308,7 +748,39 @@ def main():
     hof.add_row("苦等之王", fw(lw_u, format_duration(lw_v)), "单个作业最长排队")
     
     console.print(hof)
-    console.print(f"\n[dim]See you in {args.year + 1}! 👋[/dim]")
+    console.print(f"\n[dim]See you in {year + 1}! 👋[/dim]")
+
+def main():
+    args = build_argparser().parse_args()
+
+    data_path = os.path.join(DATA_DIR, f"{args.year}.bin")
+    cache_dir = os.path.join(DATA_DIR, "rendered", str(args.year))
+    history_path = os.path.join(DATA_DIR, HISTORY_FILE)
+
+    if not os.path.exists(data_path):
+        console.print(f"[red]No data found for {args.year}[/red]"); os._exit(1)
+
+    if args.prerender:
+        prerender_all(data_path, history_path, cache_dir, args.year, args.jobs,
+                      [args.width] if args.width else RENDER_WIDTHS, args.html)
+        return
+
+    if args.serve:
+        serve(data_path, history_path, args.year, args.socket or SOCKET_PATH.format(year=args.year), args.cache_size)
+        return
+
+    username = os.popen("whoami").read().strip()
+
+    # 预渲染缓存命中时直接输出，跳过加载数据与渲染 (缓存中不含 --top 部分)
+    if not args.top:
+        cached = load_cached_report(cache_dir, data_path, history_path, username, console.width, plain=not console.is_terminal)
+        if cached is not None:
+            sys.stdout.write(cached); return
+
+    with open(data_path, "rb") as f: data = pickle.load(f)
+    if username not in data: console.print(f"[red]User {username} not found[/red]"); os._exit(1)
+
+    render_report(console, data, username, args.year, args.top, load_history(history_path).get(username))
 
 if __name__ == "__main__":
     main()
@@ -3,10 +3,31 @@ import time
 import pickle
 import argparse
 import statistics
-import re
 import multiprocessing
 import bisect
-from functools import partial
+import random
+import shutil
+import tempfile
+import itertools
+from query import write_job_index, JobIndexBuilder
+from occupancy import compute_occupancy, new_cluster, sweep_sorted_events, peak_concurrency
+from quantile_sketch import sketch_summary
+from log_follower import LogFollower, ACTIVE_LOG
+from prefetch_reader import BLOCK_SIZE
+from log_files import file_fingerprint, skip_duplicate_files
+from job_records import parse_job_line, iter_rows, job_key, user_sort_key, job_efficiency
+from sample_preview import sample_single_file, print_estimates
+from partial import new_partial, add_file_result, merge_partials, ordered_results, shard_of, parse_shard, write_partial, load_partial
+from cwd_trie import trie_new, trie_add, trie_merge, trie_top, cwd_components, CLUSTER_MAX_NODES
+from topk import top_finalize
+from job_arrays import RowCompactor, expand_rows, count_rows
+from anomaly import anomaly_finalize
+from job_stats import JobStats
+from waste import waste_add, waste_merge, waste_total
+from groups import load_groups, group_info, rank_members
+from history import update_history, HISTORY_FILE
+from executors import EXECUTORS, choose_executor, starmap
+from spill import N_PARTITIONS, ROW_BYTES, ExternalSorter, LastKey, merge_runs, spill_single_file
 
 # --- 核心辅助函数 ---
 def timestamp_2_mytime(timestamp):
@@ -15,187 +36,32 @@ def timestamp_2_mytime(timestamp):
 def mytime_2_timestamp(mytime):
     return time.mktime(time.strptime(mytime, '%Y,%m,%d,%H,%M,%S'))
 
-def check_timestamp_is_inside(start_time, end_time, target_time):
-    return start_time <= target_time <= end_time
-
 def extract_hms_from_timestamp(timestamp):
     return time.strftime('%H%M%S', time.localtime(timestamp))
 
 def extract_md_from_timestamp(timestamp):
     return time.strftime('%m%d', time.localtime(timestamp))
 
-# --- 正则修复 ---
-# 旧正则: r'"([^"]*)"...' 遇到 "" 会失败
-# 新正则: r'"((?:[^"]|"")*)"...' 能匹配包含 "" 的字段
-CPU_TIME_PATTERN = re.compile(r'"((?:[^"]|"")*)"\s+"((?:[^"]|"")*)"\s+([0-9\.]+)')
-
-def process_single_file(file_path, year, year_start, year_end):
-    """ 单个文件处理函数 """
-    local_data = []
-    if not os.path.exists(file_path): return []
+def process_single_file(file_path, year, year_start, year_end, next_path=None):
+    """
+    单个文件处理函数，返回 (作业列表, JobStats: 排队时间草图、Top-K 作业与异常基线)
+    作业列表中同一作业数组的元素压缩为组记录 (job_arrays)，用 expand_rows 还原
+    next_path: 下一个待处理的文件，读完本文件后提示内核预读
+    """
+    local_data = RowCompactor()
+    local_stats = JobStats()
+    if not os.path.exists(file_path): return local_data.items, local_stats
     
     print(f"🚀 [PID {os.getpid()}] Processing: {os.path.basename(file_path)}")
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-            for line in f:
-                if "JOB_FINISH" not in line: continue
-                try:
-                    parts = line.split()
-                    if len(parts) < 20: continue
-
-                    user = parts[11].strip('"')
-                    queue = parts[12].strip('"')
-                    timesub_stamp = int(parts[7])
-                    timestart_stamp = int(parts[10])
-                    timeend_stamp = int(parts[2])
-                    
-                    try: cores = int(parts[23]) 
-                    except: cores = 1
-
-                    if timestart_stamp == 0: continue
-                    if not check_timestamp_is_inside(year_start, year_end, timesub_stamp): continue
-
-                    # --- 修复核心：智能提取 CPU Time ---
-                    matches = CPU_TIME_PATTERN.findall(line)
-                    cpu_time = 0.0
-                    command_str = ""
-                    
-                    found_valid_cpu = False
-                    for m in matches:
-                        # m = (Group1_Str, Group2_Str, Group3_Num)
-                        g1_str = m[0]
-                        g2_str = m[1]
-                        g3_num = m[2]
-
-                        try:
-                            val = float(g3_num)
-                            
-                            # 1. 过滤头部的时间戳 (Group2如果是纯数字字符串，通常是timestamp)
-                            #    例如: "%J.err" "1733150264.13" 0
-                            try:
-                                if float(g2_str) > 0: 
-                                    continue # Group2 是数字，说明这是 timestamp 字段，跳过
-                            except:
-                                pass # Group2 不是数字，可能是 Command，继续检查
-
-                            # 2. 过滤 JOB_FINISH
-                            if g1_str == "JOB_FINISH": continue
-                            
-                            # 3. 过滤 "default" (Ask String 字段)
-                            if g2_str == "default": continue
-
-                            # 4. 过滤 Host 列表 (通常 Host1 == Host2，或者是在 Host 列表末尾)
-                            #    例如: "hostA" "hostA" 64 (Int)
-                            #    而 Command 字段通常 G1(JobName) != G2(Command)
-                            if g1_str == g2_str: continue
-                            
-                            # 5. 过滤空字符串
-                            if g1_str == "" and g2_str == "": continue
-
-                            # 通过所有过滤，认为是有效的 CPU Time
-                            # 我们不断更新 cpu_time，因为 LSF 日志中 Command 字段出现在 Host 字段之后
-                            # 最后的有效匹配通常就是 Command
-                            command_str = g2_str
-                            cpu_time = val
-                            found_valid_cpu = True
-
-                        except:
-                            continue
-                            
-                    if not found_valid_cpu:
-                        continue
-                    # -------------------------------
-
-                    # 软件识别
-                    soft_mark = 0
-                    line_soft = line.lower()   
-                    software = "others"
-                    if "g16" in line_soft or "g09" in line_soft or "g03" in line_soft and ".gjf" in line_soft and soft_mark == 0:
-                        software = "gaussian"
-                        soft_mark = 1
-                    elif "vasp" in line_soft and "mpirun" in line_soft and soft_mark == 0:
-                        software = "vasp"
-                        soft_mark = 1
-                    elif "qchem" in line_soft and soft_mark == 0:
-                        software = "qchem"
-                        soft_mark = 1
-                    elif "cp2k" in line_soft and soft_mark == 0:
-                        software = "cp2k"
-                        soft_mark = 1
-                    elif "lmp " in line_soft or "lmp_" in line_soft or "lmp-" in line_soft or "lammps" in line_soft or "LAMMPS" in line_soft and soft_mark == 0:
-                        software = "lammps"
-                        soft_mark = 1
-                    elif "pmemd" in line_soft and soft_mark == 0:
-                        software = "amber"
-                        soft_mark = 1
-                    elif "gmx " in line_soft and soft_mark == 0:
-                        software = "gromacs"
-                        soft_mark = 1
-                    elif "namd2 " in line_soft or "namd3 " in line_soft or "charmrun" in line_soft and soft_mark == 0:
-                        software = "namd"
-                        soft_mark = 1
-                    elif "xtb " in line_soft and soft_mark == 0:
-                        software = "xtb"
-                        soft_mark = 1
-                    elif "orca" in line_soft and "openmpi" in line_soft and soft_mark == 0:
-                        software = "orca"
-                        soft_mark = 1
-                    elif "nwchem " in line_soft and soft_mark == 0:
-                        software = "nwchem"
-                        soft_mark = 1
-                    elif "rest" in line_soft and soft_mark == 0:
-                        software = "rest"
-                        soft_mark = 1
-                    elif "xcfour" in line_soft and soft_mark == 0:
-                        software = "cfour"
-                        soft_mark = 1
-                    elif "molcas" in line_soft or "pymolcas " in line_soft and soft_mark == 0:
-                        software = "molcas"
-                        soft_mark = 1
-                    elif "molpro" in line_soft and soft_mark == 0:
-                        software = "molpro"
-                        soft_mark = 1
-                    elif "psi4" in line_soft and soft_mark == 0:
-                        software = "psi4"
-                        soft_mark = 1
-                    elif "pyscf" in line_soft and "python" in line_soft and soft_mark == 0:
-                        software = "pyscf"
-                        soft_mark = 1
-                    elif "aims" in line_soft and soft_mark == 0:
-                        software = "aims"
-                        soft_mark = 1
-                    elif "jdftx" in line_soft and soft_mark == 0:
-                        software = "jdftx"
-                        soft_mark = 1
-                    elif "pw.x" in line_soft or "dos.x" in line_soft or "bands.x" in line_soft or "pp.x" in line_soft and soft_mark == 0:
-                        software = "quantum espresso"
-                        soft_mark = 1
-                    elif "cmake" in line_soft and soft_mark == 0:
-                        software = "cmake build"
-                        soft_mark = 1
-                    elif "make" in line_soft and soft_mark == 0:
-                        software = "make build"
-                        soft_mark = 1
-                    elif "python" in line_soft or "python3" in line_soft and soft_mark == 0:
-                        software = "python program"
-                        soft_mark = 1
-                    else:
-                        software = "others"
-                        soft_mark = 1
-                    # --- 逻辑结束 ---
-                    
-                    run_time = timeend_stamp - timestart_stamp
-                    wait_time = timestart_stamp - timesub_stamp
-                    
-                    # 宽松过滤，保留真实长作业
-                    if run_time > 365 * 86400: continue
-                    if wait_time > 365 * 86400: continue
-
-                    local_data.append([user, queue, timesub_stamp, cores, software, wait_time, run_time, cpu_time])
-                except: continue
+        # 后台线程大块预读，I/O 与解析重叠 (日志通常位于 NFS)；年份窗口在原始字节上先行过滤
+        for job in iter_rows([file_path], year_start, year_end, next_path=next_path):
+            local_data.add(job)
+            # 排队时间草图、Top-K 作业与异常基线在 worker 内更新
+            local_stats.add(job)
     except Exception as e: print(f"Error: {e}")
-    print(f"✅ [PID {os.getpid()}] Finished {os.path.basename(file_path)}: {len(local_data)} jobs")
-    return local_data
+    print(f"✅ [PID {os.getpid()}] Finished {os.path.basename(file_path)}: {local_data.rows} jobs")
+    return local_data.items, local_stats
 
 def calculate_distribution(data_list):
     """
@@ -229,119 +95,609 @@ def calculate_distribution(data_list):
         
     return dict(zip(labels, counts))
 
-def main():
-    argparser = argparse.ArgumentParser()
-    argparser.add_argument('-d', '--dir', required=True)
-    argparser.add_argument('-y', '--year', type=int, required=True)
-    argparser.add_argument('-c', '--cores', default=8, type=int)
-    args = argparser.parse_args()
+# 初始化结构
+BASE_DICT = {
+    'jobs_count': 0, 'runtime_sum': 0, 'cpu_time_sum': 0,
+    'date': {}, 'queue': {}, 'software': {},
+    'latest_time': "000000", 'latest_time_date': "0101",
+    'biggest_runtime': 0, 'biggest_wait_time': 0,
+    'runtime': [], 'wait_time': [], 'efficiency': [],
+    'holiday_count': 0,
+    'time_period': {"1-6": 0, "7-12": 0, "13-18": 0, "19-24": 0},
+    'dist_runtime': {}, 'dist_waittime': {},
+    'cwd': trie_new(),
+    'waste': {}
+}
+# 每个用户/集群展示的核时最多的目录数
+TOP_DIRS = 10
+# 只在聚合过程中使用的原始列表，写出结果前剔除
+RAW_LIST_KEYS = ('runtime', 'wait_time', 'efficiency')
+
+def new_user_dict():
+    return pickle.loads(pickle.dumps(BASE_DICT))
+
+def new_cluster_dict():
+    """ 集群整体 ("all") 的统计字典: 目录前缀树容量更大 """
+    d = new_user_dict()
+    d['cwd']['max_nodes'] = CLUSTER_MAX_NODES
+    return d
+
+def new_aggregate(keep_jobs=True):
+    """
+    聚合状态:
+      users: {user: 统计字典}，"all" 为集群整体
+      node:  节点维度只在集群层面统计 {host: {'jobs': 作业数, 'core_seconds': 占用核秒, 'max_slots': 单作业最大槽位}}
+      stats: JobStats (排队时间草图、Top-K 作业、异常基线)
+      jobs:  全部作业行 (用于作业索引与占用扫描)；keep_jobs=False 时为 None，不保留作业行
+      seen:  已计入作业的去重键集合
+    """
+    return {'users': {"all": new_cluster_dict()}, 'node': {}, 'stats': JobStats(),
+            'jobs': [] if keep_jobs else None, 'seen': set()}
 
-    start_t = time.time()
-    year_start = mytime_2_timestamp(f"{args.year},01,01,00,00,00")
-    year_end = mytime_2_timestamp(f"{args.year},12,31,23,59,59")
+def add_job(agg, job, holiday_set):
+    """
+    把一个作业增量累加到聚合状态 (批处理与 --watch 共用)
+    重复的作业 (同一记录出现在多份日志拷贝中) 不计入并返回 False
+    """
+    key = job_key(job)
+    if key in agg['seen']: return False
+    agg['seen'].add(key)
+
+    all_dict = agg['users']
+    node_dict = agg['node']
+    user, queue, sub_ts, cores, soft, wait, run, cpu, hosts = job[:9]
+    if agg['jobs'] is not None: agg['jobs'].append(job)
+    cwd_path = cwd_components(user, job[11])
+    date_md = extract_md_from_timestamp(sub_ts)
+    sub_hms = int(extract_hms_from_timestamp(sub_ts))
+    
+    eff = job_efficiency(job)
+
+    if user not in all_dict: all_dict[user] = new_user_dict()
+
+    for host, slots in hosts:
+        n = node_dict.get(host)
+        if n is None: n = node_dict[host] = {'jobs': 0, 'core_seconds': 0, 'max_slots': 0}
+        n['jobs'] += 1
+        n['core_seconds'] += slots * run
+        if slots > n['max_slots']: n['max_slots'] = slots
+
+    for target in [user, "all"]:
+        d = all_dict[target]
+        d['jobs_count'] += 1
+        d['runtime_sum'] += run
+        d['cpu_time_sum'] += cpu
+        d['date'][date_md] = d['date'].get(date_md, 0) + 1
+        d['queue'][queue] = d['queue'].get(queue, 0) + 1
+        d['software'][soft] = d['software'].get(soft, 0) + 1
+        d['runtime'].append(run)
+        d['wait_time'].append(wait)
+        d['efficiency'].append(eff)
+        trie_add(d['cwd'], cwd_path, run * cores)
+        waste_add(d['waste'], job)
+        
+        # 2. 统计假期内卷 (修复点)
+        if date_md in holiday_set:
+            d['holiday_count'] += 1
+
+        if sub_hms < 60000: d['time_period']["1-6"] += 1
+        elif sub_hms < 120000: d['time_period']["7-12"] += 1
+        elif sub_hms < 180000: d['time_period']["13-18"] += 1
+        else: d['time_period']["19-24"] += 1
+
+        if run > d['biggest_runtime']: d['biggest_runtime'] = run
+        if wait > d['biggest_wait_time']: d['biggest_wait_time'] = wait
+        if sub_hms < 60000 and sub_hms > int(d['latest_time']):
+            d['latest_time'] = str(sub_hms).zfill(6)
+            d['latest_time_date'] = date_md
+    return True
+
+def most_freq_date(date_counts):
+    """ 次数相同时取较早的日期，结果与作业的处理顺序无关 """
+    return max(sorted(date_counts), key=date_counts.get)
+
+def finalize_user_dict(src):
+    """ 由含原始列表的统计字典生成输出字典 (均值/中位数/分布)，不修改 src """
+    d = {k: v for k, v in src.items() if k not in RAW_LIST_KEYS}
+    d['top_dirs'] = trie_top(src['cwd'], TOP_DIRS)
+    d['waste_total'] = waste_total(src['waste'])
+    if src['jobs_count'] == 0: return d
+
+    d['mean_runtime'] = int(statistics.mean(src['runtime']))
+    d['median_runtime'] = int(statistics.median(src['runtime']))
+    d['mean_waittime'] = int(statistics.mean(src['wait_time']))
+    d['median_waittime'] = int(statistics.median(src['wait_time']))
+    d['mean_efficiency'] = round(statistics.mean(src['efficiency']), 2) if src['efficiency'] else 0.0
+    
+    d['most_freq_date'] = most_freq_date(d['date'])
+
+    # 计算分布
+    d['dist_runtime'] = calculate_distribution(src['runtime'])
+    d['dist_waittime'] = calculate_distribution(src['wait_time'])
+    return d
+
+def merge_user_dict(dst, src):
+    """ 把 src 的计数类统计合并进 dst (原始列表除外)，合并满足交换律与结合律 """
+    for k in ('jobs_count', 'runtime_sum', 'cpu_time_sum', 'holiday_count'):
+        dst[k] += src[k]
+    for k in ('date', 'queue', 'software', 'time_period'):
+        counter = dst[k]
+        for name, v in src[k].items():
+            counter[name] = counter.get(name, 0) + v
+    if src['biggest_runtime'] > dst['biggest_runtime']: dst['biggest_runtime'] = src['biggest_runtime']
+    if src['biggest_wait_time'] > dst['biggest_wait_time']: dst['biggest_wait_time'] = src['biggest_wait_time']
+    if src['latest_time'] > dst['latest_time']:
+        dst['latest_time'] = src['latest_time']
+        dst['latest_time_date'] = src['latest_time_date']
+    trie_merge(dst['cwd'], src['cwd'])
+    waste_merge(dst['waste'], src['waste'])
+    return dst
+
+def add_to_groups(group_src, groups, user, src):
+    """ 把一个用户已聚合好的统计字典合并进其所有上级组 (映射中没有的用户不属于任何组) """
+    for group in groups.get(user, ()):
+        gs = group_src.get(group)
+        if gs is None:
+            gs = group_src[group] = new_cluster_dict()
+            gs['members'] = []
+        merge_user_dict(gs, src)
+        gs['members'].append(user)
+
+def finalize_group_dict(src):
+    """ 组只有合并得到的计数类统计: 没有中位数与分布，均值由总和计算 """
+    d = {k: v for k, v in src.items() if k not in RAW_LIST_KEYS}
+    d['members'] = sorted(src['members'])
+    d['top_dirs'] = trie_top(src['cwd'], TOP_DIRS)
+    d['waste_total'] = waste_total(src['waste'])
+    if src['jobs_count'] == 0: return d
+    d['mean_runtime'] = src['runtime_sum'] // src['jobs_count']
+    d['most_freq_date'] = most_freq_date(d['date'])
+    return d
+
+def apply_groups(out, group_src, groups):
+    """ 组汇总写入 out["all"]['groups']；每个用户记录所属组链 'groups' 与组内排名 'group_ranks' """
+    info = group_info(groups)
+    out["all"]['groups'] = {}
+    for group, src in group_src.items():
+        gd = finalize_group_dict(src)
+        gd.update(info[group])
+        out["all"]['groups'][group] = gd
+        for user, ranks in rank_members(out, gd['members']).items():
+            out[user].setdefault('group_ranks', {})[group] = ranks
+    for user, chain in groups.items():
+        if user in out: out[user]['groups'] = list(chain)
+
+def regroup_report(year, groups):
+    """ 只有 --groups: 用新的映射重新汇总已有的 {year}.bin (输出的用户字典保留了全部计数类统计)，不解析日志 """
+    with open(f"{year}.bin", 'rb') as f:
+        out = pickle.load(f)
+    out["all"].pop('groups', None)
+    group_src = {}
+    for user, d in out.items():
+        if user == "all": continue
+        d.pop('groups', None); d.pop('group_ranks', None)
+        add_to_groups(group_src, groups, user, d)
+    apply_groups(out, group_src, groups)
+    tmp_path = f"{year}.bin.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(out, f)
+    os.replace(tmp_path, f"{year}.bin")
+    return out
+
+def finalize_cluster(out, node_dict, stats):
+    """ 集群层面的附加统计，写入 out["all"]；各用户的 Top-K 作业写入 out[user] """
+    out["all"]['node'] = node_dict
+    wait_sketch = stats.wait_sketch
+    # 原始草图供其他工具按需查询任意分位数；p50/p90/p99 预先算好供 annual-report.py 直接展示
+    out["all"]['wait_sketch'] = wait_sketch
+    out["all"]['wait_quantiles'] = {
+        queue: {month: sketch_summary(sk) for month, sk in months.items()}
+        for queue, months in wait_sketch.items()
+    }
+    # 相对各自基线最异常的作业 (分数最高的前 ANOMALY_TOP 个)，find_outliers.py 可直接读取
+    out["all"]['anomalies'] = anomaly_finalize(stats.anomaly)
+    for user, heaps in stats.top.items():
+        if user in out: out[user]['top_jobs'] = top_finalize(heaps)
+
+def apply_occupancy(out, cluster_occ, user_peaks):
+    out["all"]['occupancy'] = cluster_occ
+    out["all"]['peak_cores'] = cluster_occ['peak_cores']
+    out["all"]['peak_jobs'] = cluster_occ['peak_jobs']
+    for user, peaks in user_peaks.items():
+        out[user].update(peaks)
+
+def finalize_aggregate(agg, year_start, year_end, resolution, groups=None):
+    """
+    由聚合状态生成写入 {year}.bin 的结果字典
+    不修改 agg 本身，--watch 模式下可在快照之后继续累加
+    groups: load_groups 的映射，按组合并各用户的统计
+    """
+    out = {user: finalize_user_dict(src) for user, src in agg['users'].items()}
+    finalize_cluster(out, agg['node'], agg['stats'])
+    if groups:
+        group_src = {}
+        for user, src in agg['users'].items():
+            if user != "all": add_to_groups(group_src, groups, user, src)
+        apply_groups(out, group_src, groups)
+
+    # 扫描线统计集群占用曲线与每个用户的峰值并发
+    jobs = agg['jobs']
+    occ_start = time.time()
+    starts = [job[2] + job[5] for job in jobs]
+    cluster_occ, user_peaks = compute_occupancy(
+        starts, [s + job[6] for s, job in zip(starts, jobs)],
+        [job[3] for job in jobs], [job[0] for job in jobs],
+        int(year_start), int(year_end) + 1, resolution)
+    del starts
+    apply_occupancy(out, cluster_occ, user_peaks)
+    print(f"Occupancy sweep done in {time.time() - occ_start:.2f}s, peak {cluster_occ['peak_cores']} cores")
+    return out
+
+# --- --max-memory: 落盘聚合 ---
+# 集群占用事件打包为单个 int64: ((相对时间 << 1) | 是否开始) << 24 | 核数，数值顺序即 (时间, 结束先于开始)
+_EVENT_CORE_BITS = 24
+
+def pack_event(t, is_start, cores, base):
+    return ((((t - base) << 1) | is_start) << _EVENT_CORE_BITS) | min(cores, (1 << _EVENT_CORE_BITS) - 1)
+
+def iter_unpacked_events(sorted_keys, base):
+    mask = (1 << _EVENT_CORE_BITS) - 1
+    for key in sorted_keys:
+        cores = key & mask
+        key >>= _EVENT_CORE_BITS
+        yield (key >> 1) + base, cores if key & 1 else -cores
+
+def new_value_sorters(spill_dir, limit):
+    return {
+        'runtime': ExternalSorter(spill_dir, limit),
+        'wait_time': ExternalSorter(spill_dir, limit),
+        'efficiency': ExternalSorter(spill_dir, limit, 'd', keep=False),
+    }
 
+def finalize_spilled_user(src, sorters):
+    """ 与 finalize_user_dict 相同的输出，但均值/中位数/分布来自外部排序器 """
+    d = {k: v for k, v in src.items() if k not in RAW_LIST_KEYS}
+    d['top_dirs'] = trie_top(src['cwd'], TOP_DIRS)
+    d['waste_total'] = waste_total(src['waste'])
+    if src['jobs_count'] == 0: return d
+    rt, wt, eff = sorters['runtime'], sorters['wait_time'], sorters['efficiency']
+
+    d['mean_runtime'] = int(rt.mean())
+    d['median_runtime'] = int(rt.median())
+    d['mean_waittime'] = int(wt.mean())
+    d['median_waittime'] = int(wt.median())
+    d['mean_efficiency'] = round(eff.mean(), 2) if eff.count else 0.0
+
+    d['most_freq_date'] = most_freq_date(d['date'])
+
+    # 计算分布 (按升序流式遍历，不需要把取值读回内存)
+    d['dist_runtime'] = calculate_distribution(rt)
+    d['dist_waittime'] = calculate_distribution(wt)
+    return d
+
+def aggregate_spilled(runs, stats, holiday_set, year_start, year_end, resolution, spill_dir, value_limit,
+                      groups=None):
+    """
+    逐分区归并 run 文件、逐用户聚合；返回 (结果字典, JobIndexBuilder)
+    每个用户聚合完即输出并释放，内存中只保留各外部排序器的缓冲、各用户的小结果字典与作业索引列
+    """
+    by_part = {}
+    for p, path in runs:
+        by_part.setdefault(p, []).append(path)
+
+    base = int(year_start)
+    out = {}
+    all_src = new_cluster_dict()
+    group_src = {}
+    node_dict = {}
+    index = JobIndexBuilder()
+    all_sorters = new_value_sorters(spill_dir, value_limit)
+    events = ExternalSorter(spill_dir, value_limit)
+    duplicates = 0
+    try:
+        for p in sorted(by_part):
+            for user, group in itertools.groupby(merge_runs(by_part[p], user_sort_key), key=lambda j: j[0]):
+                # 作业按 (用户, 去重键) 有序到达: 去重只比较上一个键，取值直接进入外部排序器
+                agg = new_aggregate(keep_jobs=False)
+                agg['node'] = node_dict
+                agg['seen'] = LastKey()
+                sorters = new_value_sorters(spill_dir, value_limit)
+                ud = agg['users'][user] = new_user_dict()
+                ud.update(sorters)
+                agg['users']["all"].update(all_sorters)
+                user_events = ExternalSorter(spill_dir, value_limit)
+                for job in group:
+                    if not add_job(agg, job, holiday_set):
+                        # 重复记录已在 worker 中计入 stats
+                        stats.undo(job)
+                        duplicates += 1
+                        continue
+                    index.add(job)
+                    s = job[2] + job[5]; e = s + job[6]
+                    for ev in (pack_event(s, 1, job[3], base), pack_event(e, 0, job[3], base)):
+                        events.add(ev); user_events.add(ev)
+
+                out[user] = finalize_spilled_user(ud, sorters)
+                out[user].update(peak_concurrency(iter_unpacked_events(user_events, base)))
+                for srt in sorters.values(): srt.close()
+                user_events.close()
+                merge_user_dict(all_src, ud)
+                if groups: add_to_groups(group_src, groups, user, ud)
+
+        out["all"] = finalize_spilled_user(all_src, all_sorters)
+        finalize_cluster(out, node_dict, stats)
+        if groups: apply_groups(out, group_src, groups)
+
+        occ_start = time.time()
+        cluster_occ = new_cluster(year_start, int(year_end) + 1, resolution)
+        sweep_sorted_events(iter_unpacked_events(events, base), cluster_occ)
+        apply_occupancy(out, cluster_occ, {})
+        print(f"Occupancy sweep done in {time.time() - occ_start:.2f}s, peak {cluster_occ['peak_cores']} cores")
+    finally:
+        for srt in all_sorters.values(): srt.close()
+        events.close()
+    if duplicates: print(f"Skipped {duplicates} duplicate job records")
+    return out, index
+
+def run_spill(log_files, args, holiday_set, year_start, year_end, groups=None):
+    """ --max-memory: worker 输出按用户分区排序落盘，父进程逐用户聚合，峰值内存受预算约束 """
+    budget = args.max_memory << 20
+    kind, workers = plan_workers(args, log_files)
+    # worker 阶段与聚合阶段不重叠: worker 平分预算，其中约 1/4 给预读 (读取器约占 10 个块)，其余缓冲作业行
+    worker_budget = budget // workers
+    block_size = min(BLOCK_SIZE, max(64 << 10, worker_budget // 40))
+    buffer_rows = max(1000, worker_budget * 3 // 4 // ROW_BYTES)
+    # 聚合阶段同时缓冲取值的外部排序器: 用户与集群各自的运行/排队时长与占用事件，共 6 个，
+    # 排序时另需一份临时拷贝，每个分到预算的 1/16 (作业索引列另计，约 48 字节/作业)
+    value_limit = max(1 << 12, budget // 16 // 8)
+
+    spill_dir = tempfile.mkdtemp(prefix=f"annual-report-{args.year}-", dir=args.spill_dir)
+    print(f"Processing {len(log_files)} files with {workers} workers ({kind}), memory cap {args.max_memory} MB, spilling to {spill_dir}...")
+    try:
+        tasks = [(path, args.year, year_start, year_end, next_path, spill_dir, N_PARTITIONS, buffer_rows, block_size)
+                 for path, next_path in zip(log_files, log_files[1:] + [None])]
+        results = starmap(kind, spill_single_file, tasks, workers)
+
+        stats = JobStats()
+        runs = []
+        for local_runs, local_stats in results:
+            runs.extend(local_runs)
+            stats.merge(local_stats)
+        del results
+
+        out, index = aggregate_spilled(runs, stats, holiday_set, year_start, year_end,
+                                       args.resolution, spill_dir, value_limit, groups)
+        print(f"Total jobs: {out['all']['jobs_count']}. Saving...")
+        save_report(out, index, args.year, covers_all_logs(args))
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+def save_report(out, jobs, year, history=True):
+    """
+    原子写出 {year}.bin 与 {year}.idx，读者不会看到写了一半的文件；jobs 为作业行列表或 JobIndexBuilder
+    history: 同时更新跨年份汇总索引 history.bin 中该年份的条目 (只解析部分日志时不更新)
+    """
+    # 按提交时间排序的作业索引，供 query.py 做任意时间段/用户/队列查询
+    write_job_index(jobs, f"{year}.idx")
+    tmp_path = f"{year}.bin.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(out, f)
+    os.replace(tmp_path, f"{year}.bin")
+    if history: update_history(out, year)
+
+def covers_all_logs(args):
+    """ --files / --shard 只解析部分日志，结果不能替换 history.bin 中该年份的条目 """
+    if args.files or args.shard:
+        print(f"Note: partial file list, {HISTORY_FILE} not updated")
+        return False
+    return True
+
+def load_holidays(year):
     # 1. 读取假期数据 (修复点)
     holiday_set = set()
     if os.path.exists("holidays.txt"):
         with open("holidays.txt", 'r') as f:
             for line in f:
                 parts = line.split()
-                if len(parts) == 2 and parts[0] == str(args.year):
+                if len(parts) == 2 and parts[0] == str(year):
                     holiday_set.add(parts[1]) # 格式 MMDD
     else:
         print("Warning: holidays.txt not found. Holiday count will be 0.")
+    return holiday_set
 
-    log_files = []
-    if os.path.exists(args.dir):
-        log_files = [os.path.join(args.dir, f) for f in os.listdir(args.dir) if "lsb.acct" in f]
-
-    # 智能核数
+def plan_workers(args, log_files):
+    """ 智能核数，并按 --executor 选择执行后端；返回 (后端, worker 数) """
     real_cpu = os.cpu_count() or 1
-    pool_size = min(args.cores, len(log_files), real_cpu)
-    if pool_size < 1: pool_size = 1
-
-    print(f"Processing {len(log_files)} files with {pool_size} processes...")
-    with multiprocessing.Pool(pool_size) as pool:
-        func = partial(process_single_file, year=args.year, year_start=year_start, year_end=year_end)
-        results = pool.map(func, log_files)
-
-    raw_data = [item for sublist in results for item in sublist]
-    print(f"Total jobs: {len(raw_data)}. Analyzing...")
-
-    # 初始化结构
-    base_dict = {
-        'jobs_count': 0, 'runtime_sum': 0, 'cpu_time_sum': 0,
-        'date': {}, 'queue': {}, 'software': {},
-        'latest_time': "000000", 'latest_time_date': "0101",
-        'biggest_runtime': 0, 'biggest_wait_time': 0,
-        'runtime': [], 'wait_time': [], 'efficiency': [],
-        'holiday_count': 0,
-        'time_period': {"1-6": 0, "7-12": 0, "13-18": 0, "19-24": 0},
-        'dist_runtime': {}, 'dist_waittime': {} 
-    }
-    
-    all_dict = {"all": pickle.loads(pickle.dumps(base_dict))}
+    workers = max(1, min(args.cores, len(log_files), real_cpu))
+    return choose_executor(args.executor, log_files, workers), workers
+
+def run_pool(log_files, args, year_start, year_end):
+    kind, workers = plan_workers(args, log_files)
+    print(f"Processing {len(log_files)} files with {workers} workers ({kind})...")
+    if not log_files: return []
+    # 每个任务附带下一个文件名，用于预读提示
+    tasks = [(path, args.year, year_start, year_end, next_path)
+             for path, next_path in zip(log_files, log_files[1:] + [None])]
+    return starmap(kind, process_single_file, tasks, workers)
+
+def map_single_file(file_path, year, year_start, year_end, next_path=None):
+    """ map 步骤的 worker: 在解析结果之外附带文件指纹，reduce 时据此识别其他节点上的相同拷贝 """
+    return (file_fingerprint(file_path),) + process_single_file(file_path, year, year_start, year_end, next_path)
+
+def run_map(log_files, aliases, args, year_start, year_end):
+    """ --map: 解析本节点分到的日志，写出 partial 文件而不是 {year}.bin """
+    kind, workers = plan_workers(args, log_files)
+    print(f"Mapping {len(log_files)} files with {workers} workers ({kind})...")
+    partial = new_partial(args.year)
+    if log_files:
+        tasks = [(path, args.year, year_start, year_end, next_path)
+                 for path, next_path in zip(log_files, log_files[1:] + [None])]
+        results = starmap(kind, map_single_file, tasks, workers)
+        for path, (fp, local_data, local_stats) in zip(log_files, results):
+            add_file_result(partial, fp, [path] + aliases.get(path, []), local_data, local_stats)
+    write_partial(partial, args.map)
+    jobs = sum(count_rows(e['jobs']) for e in partial['files'].values())
+    print(f"Saved {args.map}: {len(partial['files'])} files, {jobs} job records")
+
+def load_partials(paths, year):
+    """ --reduce: 合并任意多个 partial 文件 (顺序无关)，返回按单节点顺序排列的解析结果 """
+    merged = new_partial(year)
+    for path in paths:
+        merge_partials(merged, load_partial(path))
+    print(f"Reducing {len(paths)} partial files ({len(merged['files'])} unique log files)...")
+    return ordered_results(merged)
+
+def aggregate_results(results, holiday_set):
+    """ 按顺序合并各文件的解析结果 (批处理与 reduce 共用) """
+    agg = new_aggregate()
+    duplicates = 0
+    for local_data, local_stats in results:
+        agg['stats'].merge(local_stats)
+        for job in expand_rows(local_data):
+            if not add_job(agg, job, holiday_set):
+                # 重复记录已在 worker 中计入 stats
+                agg['stats'].undo(job)
+                duplicates += 1
+    if duplicates: print(f"Skipped {duplicates} duplicate job records")
+    return agg
+
+def run_sample(log_files, args, year_start, year_end):
+    """ --sample: 每个文件随机抽取部分字节块解析，放大得到总量估计及 95% 置信区间 """
+    seed = args.seed if args.seed is not None else random.randrange(1 << 30)
+    kind, workers = plan_workers(args, log_files)
+    print(f"Sampling {args.sample:.1%} of {len(log_files)} files with {workers} workers ({kind}, seed {seed})...")
+    tasks = [(path, args.sample, year_start, year_end, seed) for path in log_files]
+    samples = starmap(kind, sample_single_file, tasks, workers)
+    print_estimates(samples)
 
-    for job in raw_data:
-        user, queue, sub_ts, cores, soft, wait, run, cpu = job
-        date_md = extract_md_from_timestamp(sub_ts)
-        sub_hms = int(extract_hms_from_timestamp(sub_ts))
-        
-        eff = (cpu / (run * cores)) * 100 if run > 0 and cores > 0 else 0
-        if eff > 100: eff = 100
-
-        if user not in all_dict: all_dict[user] = pickle.loads(pickle.dumps(base_dict))
-
-        for target in [user, "all"]:
-            d = all_dict[target]
-            d['jobs_count'] += 1
-            d['runtime_sum'] += run
-            d['cpu_time_sum'] += cpu
-            d['date'][date_md] = d['date'].get(date_md, 0) + 1
-            d['queue'][queue] = d['queue'].get(queue, 0) + 1
-            d['software'][soft] = d['software'].get(soft, 0) + 1
-            d['runtime'].append(run)
-            d['wait_time'].append(wait)
-            d['efficiency'].append(eff)
-            
-            # 2. 统计假期内卷 (修复点)
-            if date_md in holiday_set:
-                d['holiday_count'] += 1
-
-            if sub_hms < 60000: d['time_period']["1-6"] += 1
-            elif sub_hms < 120000: d['time_period']["7-12"] += 1
-            elif sub_hms < 180000: d['time_period']["13-18"] += 1
-            else: d['time_period']["19-24"] += 1
-
-            if run > d['biggest_runtime']: d['biggest_runtime'] = run
-            if wait > d['biggest_wait_time']: d['biggest_wait_time'] = wait
-            if sub_hms < 60000 and sub_hms > int(d['latest_time']):
-                d['latest_time'] = str(sub_hms).zfill(6)
-                d['latest_time_date'] = date_md
-
-    for user in all_dict:
-        d = all_dict[user]
-        if d['jobs_count'] == 0: continue
-
-        d['mean_runtime'] = int(statistics.mean(d['runtime']))
-        d['median_runtime'] = int(statistics.median(d['runtime']))
-        d['mean_waittime'] = int(statistics.mean(d['wait_time']))
-        d['median_waittime'] = int(statistics.median(d['wait_time']))
-        d['mean_efficiency'] = round(statistics.mean(d['efficiency']), 2) if d['efficiency'] else 0.0
-        
-        d['most_freq_date'] = max(d['date'], key=d['date'].get)
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('-d', '--dir')
+    argparser.add_argument('-y', '--year', type=int, required=True)
+    argparser.add_argument('-c', '--cores', default=8, type=int)
+    argparser.add_argument('--executor', default='auto', choices=EXECUTORS,
+                           help='Parallel backend; auto picks by interpreter (free-threaded or not) and input size')
+    argparser.add_argument('--resolution', default=3600, type=int, help='Occupancy time series bucket size (seconds)')
+    argparser.add_argument('--watch', action='store_true', help='Keep following the active lsb.acct and refresh snapshots')
+    argparser.add_argument('--interval', default=300, type=int, help='Snapshot interval in --watch mode (seconds)')
+    argparser.add_argument('--poll', default=5.0, type=float, help='Log polling interval in --watch mode (seconds)')
+    argparser.add_argument('--sample', type=float, metavar='FRACTION',
+                           help='Preview: parse only this fraction of each log and print estimates with 95%% CI')
+    argparser.add_argument('--seed', type=int, help='Random seed for --sample')
+    argparser.add_argument('--max-memory', type=int, metavar='MB',
+                           help='Keep peak memory under this cap by spilling sorted runs to disk')
+    argparser.add_argument('--spill-dir', help='Directory for --max-memory spill files (default: system temp)')
+    argparser.add_argument('--files', nargs='+', metavar='FILE', help='Parse these log files instead of listing --dir')
+    argparser.add_argument('--shard', metavar='I/N', help='Only parse files whose name hashes to shard I of N')
+    argparser.add_argument('--map', metavar='PARTIAL', help='Write a partial result file instead of {year}.bin')
+    argparser.add_argument('--reduce', nargs='+', metavar='PARTIAL', help='Merge partial result files into {year}.bin')
+    argparser.add_argument('--groups', metavar='FILE', help='User -> group [-> parent ...] mapping; adds group rollups')
+    args = argparser.parse_args()
+    if args.reduce:
+        ignored = [flag for flag, value in (('--max-memory', args.max_memory), ('--watch', args.watch),
+                                            ('--sample', args.sample)) if value]
+        if ignored: argparser.error(f"--reduce cannot be combined with {', '.join(ignored)}")
+    if args.watch and not args.dir:
+        argparser.error("--watch needs -d/--dir to locate the active lsb.acct")
+
+    start_t = time.time()
+    year_start = mytime_2_timestamp(f"{args.year},01,01,00,00,00")
+    year_end = mytime_2_timestamp(f"{args.year},12,31,23,59,59")
 
-        # 计算分布
-        d['dist_runtime'] = calculate_distribution(d['runtime'])
-        d['dist_waittime'] = calculate_distribution(d['wait_time'])
+    holiday_set = load_holidays(args.year)
+    groups = None
+    if args.groups:
+        try: groups = load_groups(args.groups)
+        except (OSError, ValueError) as e: argparser.error(str(e))
 
-        del d['runtime']
-        del d['wait_time']
-        del d['efficiency']
+    if args.reduce:
+        agg = aggregate_results(load_partials(args.reduce, args.year), holiday_set)
+        print(f"Total jobs: {len(agg['jobs'])}. Analyzing...")
+        save_report(finalize_aggregate(agg, year_start, year_end, args.resolution, groups), agg['jobs'], args.year)
+        print(f"Done. Saved {args.year}.bin")
+        return
 
-    with open(f"{args.year}.bin", 'wb') as f:
-        pickle.dump(all_dict, f)
-    print(f"Done. Saved {args.year}.bin")
+    log_files = []
+    if args.files:
+        log_files = [p for p in args.files if os.path.isfile(p)]
+        for path in args.files:
+            if not os.path.isfile(path): print(f"Skip {path}: no such file")
+    elif groups and not args.dir:
+        out = regroup_report(args.year, groups)
+        print(f"Done. Regrouped {args.year}.bin into {len(out['all']['groups'])} groups")
+        return
+    elif not args.dir:
+        argparser.error("one of -d/--dir, --files, --reduce or --groups is required")
+    elif os.path.exists(args.dir):
+        log_files = [os.path.join(args.dir, f) for f in os.listdir(args.dir) if "lsb.acct" in f]
+    if args.shard:
+        try: shard, n_shards = parse_shard(args.shard)
+        except ValueError as e: argparser.error(str(e))
+        log_files = [p for p in log_files if shard_of(p, n_shards) == shard]
+    # 内容完全相同的日志拷贝只解析一份
+    aliases = {}
+    log_files = skip_duplicate_files(log_files, aliases)
+
+    if args.map:
+        run_map(log_files, aliases, args, year_start, year_end)
+        return
+
+    if args.sample is not None:
+        if not 0 < args.sample <= 1: argparser.error("--sample must be in (0, 1]")
+        run_sample(log_files, args, year_start, year_end)
+        print(f"Done in {time.time() - start_t:.1f}s (preview only, {args.year}.bin not written)")
+        return
+
+    if args.max_memory:
+        if args.watch: argparser.error("--max-memory cannot be combined with --watch")
+        run_spill(log_files, args, holiday_set, year_start, year_end, groups)
+        print(f"Done. Saved {args.year}.bin")
+        return
+
+    # --watch: 活动文件 lsb.acct 交给 LogFollower 从头读取并持续跟踪，不进入进程池，避免重复计数
+    if args.watch:
+        active_path = os.path.join(args.dir, ACTIVE_LOG)
+        log_files = [p for p in log_files if os.path.basename(p) != ACTIVE_LOG]
+
+    history = covers_all_logs(args)
+    results = run_pool(log_files, args, year_start, year_end)
+    agg = aggregate_results(results, holiday_set)
+    del results
+
+    if not args.watch:
+        print(f"Total jobs: {len(agg['jobs'])}. Analyzing...")
+        save_report(finalize_aggregate(agg, year_start, year_end, args.resolution, groups), agg['jobs'], args.year, history)
+        print(f"Done. Saved {args.year}.bin")
+        return
+
+    follower = LogFollower(active_path)
+    last_snapshot = 0.0
+    dirty = True
+    arrays = {}
+    print(f"Watching {active_path} (snapshot every {args.interval}s, Ctrl-C to stop)...")
+    try:
+        while True:
+            new_jobs = 0
+            for line in follower.poll():
+                job = parse_job_line(line, year_start, year_end, arrays=arrays)
+                if job is None: continue
+                if not add_job(agg, job, holiday_set): continue
+                agg['stats'].add(job)
+                new_jobs += 1
+            if new_jobs:
+                dirty = True
+                print(f"+{new_jobs} jobs (total {len(agg['jobs'])})")
+            if dirty and time.time() - last_snapshot >= args.interval:
+                save_report(finalize_aggregate(agg, year_start, year_end, args.resolution, groups), agg['jobs'], args.year, history)
+                last_snapshot = time.time(); dirty = False
+                print(f"Snapshot saved {args.year}.bin at {time.strftime('%H:%M:%S')}")
+            time.sleep(args.poll)
+    except KeyboardInterrupt:
+        if dirty:
+            save_report(finalize_aggregate(agg, year_start, year_end, args.resolution, groups), agg['jobs'], args.year, history)
+            print(f"Snapshot saved {args.year}.bin")
+    finally:
+        follower.close()
 
 if __name__ == '__main__':
     multiprocessing.freeze_support()
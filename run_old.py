@@ -3,6 +3,8 @@ import time
 import pickle
 import argparse
 
+from job_records import iter_jobs
+
 
 def timestamp_2_mytime(timestamp):
     return time.strftime('%Y,%m,%d,%H,%M,%S', time.localtime(timestamp))
@@ -32,90 +34,9 @@ def read_in_data(data_file, year):
     year_start_stamp = mytime_2_timestamp(str(year) + ",01,01,00,00,00")
     year_end_stamp = mytime_2_timestamp(str(year) + ",12,31,23,59,59")
     return_list = []
-    with open(data_file, 'r', encoding='utf-8', errors='replace') as f:
-        data = f.readlines()
-    for line in data:
-        try:
-            soft_mark = 0
-            line_split = line.split()
-            name = line_split[11].strip('"')
-            queue = line_split[12].strip('"')
-            timesub_stamp = int(line_split[7])
-            timestart_stamp = int(line_split[10])
-            if timestart_stamp == 0:
-                continue
-            timeend_stamp = int(line_split[2])
-            cores = int(line_split[6])
-
-            if "g16" in line or "g09" in line or "g03" in line and ".gjf" in line and soft_mark == 0:
-                software = "gaussian"
-                soft_mark = 1
-            elif "vasp" in line and "mpirun" in line and soft_mark == 0:
-                software = "vasp"
-                soft_mark = 1
-            elif "qchem" in line and soft_mark == 0:
-                software = "qchem"
-                soft_mark = 1
-            elif "cp2k" in line and soft_mark == 0:
-                software = "cp2k"
-                soft_mark = 1
-            elif "lmp " in line or "lmp_" in line or "lmp-" in line or "lammps" in line or "LAMMPS" in line and soft_mark == 0:
-                software = "lammps"
-                soft_mark = 1
-            elif "pmemd" in line and soft_mark == 0:
-                software = "amber"
-                soft_mark = 1
-            elif "gmx " in line and soft_mark == 0:
-                software = "gromacs"
-                soft_mark = 1
-            elif "namd2 " in line or "namd3 " in line or "charmrun" in line and soft_mark == 0:
-                software = "namd"
-                soft_mark = 1
-            elif "xtb " in line and soft_mark == 0:
-                software = "xtb"
-                soft_mark = 1
-            elif "ORCA" in line or "orca" in line and "openmpi" in line and soft_mark == 0:
-                software = "orca"
-                soft_mark = 1
-            elif "nwchem " in line and soft_mark == 0:
-                software = "nwchem"
-                soft_mark = 1
-            elif "rest" in line and "rust" in line and soft_mark == 0:
-                software = "rest"
-                soft_mark = 1
-            elif "xcfour" in line and soft_mark == 0:
-                software = "cfour"
-                soft_mark = 1
-            elif "molcas" in line or "Molcas" in line or "pymolcas " in line and soft_mark == 0:
-                software = "molcas"
-                soft_mark = 1
-            elif "molpro" in line and soft_mark == 0:
-                software = "molpro"
-                soft_mark = 1
-            elif "psi4" in line and soft_mark == 0:
-                software = "psi4"
-                soft_mark = 1
-            elif "PYSCF" in line or "pyscf" in line and "python" in line and soft_mark == 0:
-                software = "pyscf"
-                soft_mark = 1
-            elif "aims" in line and soft_mark == 0:
-                software = "aims"
-                soft_mark = 1
-            elif "jdftx" in line and soft_mark == 0:
-                software = "jdftx"
-                soft_mark = 1
-            elif "pw.x" in line or "dos.x" in line or "bands.x" in line or "pp.x" in line and soft_mark == 0:
-                software = "quantum espresso"
-                soft_mark = 1
-            else:
-                software = "others"
-                soft_mark = 1
-            if not check_timestamp_is_inside(year_start_stamp, year_end_stamp, timesub_stamp):
-                continue
-            #store as [name, queue, timesub_stamp, cores, software, wait_time_s, run_time_s, cpu_time_s]
-            return_list.append([name, queue, timesub_stamp, cores, software, timestart_stamp - timesub_stamp, timeend_stamp - timestart_stamp, cores * (timeend_stamp - timestart_stamp)])
-        except:
-            continue
+    for job in iter_jobs([data_file], since=year_start_stamp, until=year_end_stamp):
+        #store as [name, queue, timesub_stamp, cores, software, wait_time_s, run_time_s, cpu_time_s]
+        return_list.append([job.user, job.queue, job.submit, job.cores, job.software, job.wait, job.runtime, job.core_seconds])
     return return_list
 
 
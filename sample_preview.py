@@ -0,0 +1,114 @@
+import os
+import math
+import random
+
+from job_records import parse_job_line, job_efficiency
+
+# --- 抽样预览 (--sample) ---
+# 把每个日志文件切成固定大小的字节块，按比例随机抽取若干块，只解析这些块。
+# 一行属于它的起始字节所在的块: 块起点落在行中间时跳到下一个换行之后，块末尾的行读完整为止，
+# 因此每条记录恰好属于一个块，按块做整群抽样 (每个文件为一层) 即可无偏地放大总量并估计方差。
+# 文件末尾不满一块的尾块总是完整读取、原样计入，不参与放大，否则尾块大小不同会带来偏差。
+# 不做去重: 部分重叠的日志拷贝 (完全相同的拷贝已按指纹剔除) 中的重复记录会被重复计入，
+# 估计值对应的是所列文件中的全部记录，置信区间只反映抽样误差。
+SAMPLE_BLOCK_SIZE = 1 << 20
+Z_95 = 1.96
+
+def read_block_lines(f, start, end):
+    """ 返回起始位置落在 [start, end) 内的所有完整行 """
+    f.seek(start)
+    if start > 0:
+        f.seek(start - 1)
+        if f.read(1) != b"\n": f.readline()
+    lines = []
+    while f.tell() < end:
+        line = f.readline()
+        if not line: break
+        lines.append(line)
+    return lines
+
+def job_metrics(job):
+    """ 单个作业对各统计量的贡献；按队列的核时用 ('queue', name) 作为键 """
+    user, queue, sub_ts, cores, soft, wait, run, cpu = job[:8]
+    eff = job_efficiency(job)
+    return {
+        'jobs': 1, 'runtime_sum': run, 'cpu_time_sum': cpu, 'core_seconds': run * cores,
+        'wait_time_sum': wait, 'efficiency_sum': eff,
+        ('queue', queue): run * cores, ('software', soft): run * cores,
+    }
+
+def sample_single_file(file_path, fraction, year_start, year_end, seed, block_size=SAMPLE_BLOCK_SIZE):
+    """ 返回 (整块总数, [每个被抽中整块的统计量合计 dict, ...], 尾块统计量合计 dict) """
+    def block_totals(f, start, end):
+        totals = {}
+        for raw in read_block_lines(f, start, end):
+            job = parse_job_line(raw.decode('utf-8', 'replace'), year_start, year_end)
+            if job is None: continue
+            for k, v in job_metrics(job).items():
+                totals[k] = totals.get(k, 0) + v
+        return totals
+
+    size = os.path.getsize(file_path)
+    n_full = size // block_size
+    n_sample = min(n_full, max(2, round(n_full * fraction)))
+    rng = random.Random(f"{seed}:{os.path.basename(file_path)}")
+    picked = sorted(rng.sample(range(n_full), n_sample))
+
+    with open(file_path, 'rb') as f:
+        sampled = [block_totals(f, b * block_size, (b + 1) * block_size) for b in picked]
+        tail = block_totals(f, n_full * block_size, size) if size > n_full * block_size else {}
+    print(f"🎲 [PID {os.getpid()}] Sampled {n_sample}/{n_full} blocks of {os.path.basename(file_path)}")
+    return n_full, sampled, tail
+
+def _stratum_estimate(n_blocks, block_values):
+    """ 单层整群抽样 (无放回): 返回 (总量估计, 方差估计) """
+    n = len(block_values)
+    if n == 0: return 0.0, 0.0
+    mean = sum(block_values) / n
+    total = n_blocks * mean
+    if n < 2 or n >= n_blocks: return total, 0.0
+    s2 = sum((v - mean) ** 2 for v in block_values) / (n - 1)
+    return total, n_blocks ** 2 * (1 - n / n_blocks) * s2 / n
+
+def estimate_total(samples, key):
+    """ samples: [(整块总数, [块合计, ...], 尾块合计), ...] 每个文件一层；返回 (估计值, 95% 置信区间半宽) """
+    total = var = 0.0
+    for n_blocks, blocks, tail in samples:
+        t, v = _stratum_estimate(n_blocks, [b.get(key, 0) for b in blocks])
+        total += t + tail.get(key, 0); var += v
+    return total, Z_95 * math.sqrt(var)
+
+def estimate_ratio(samples, num_key, den_key):
+    """ 比率估计 R = Y / X，方差用线性化残差 y - R*x 计算 """
+    y, _ = estimate_total(samples, num_key)
+    x, _ = estimate_total(samples, den_key)
+    if x == 0: return 0.0, 0.0
+    r = y / x
+    var = 0.0
+    for n_blocks, blocks, _ in samples:
+        _, v = _stratum_estimate(n_blocks, [b.get(num_key, 0) - r * b.get(den_key, 0) for b in blocks])
+        var += v
+    return r, Z_95 * math.sqrt(var) / x
+
+def print_estimates(samples, top=10):
+    rows = [
+        ("Jobs", estimate_total(samples, 'jobs'), 1),
+        ("Walltime (h)", estimate_total(samples, 'runtime_sum'), 3600),
+        ("CPU time (h)", estimate_total(samples, 'cpu_time_sum'), 3600),
+        ("Core-hours", estimate_total(samples, 'core_seconds'), 3600),
+        ("Mean wait (h)", estimate_ratio(samples, 'wait_time_sum', 'jobs'), 3600),
+        ("Efficiency (%)", estimate_ratio(samples, 'efficiency_sum', 'jobs'), 1),
+    ]
+    print(f"\n{'Metric':<22} {'Estimate':>16} {'95% CI':>18}")
+    for name, (est, ci), unit in rows:
+        print(f"{name:<22} {est / unit:>16,.1f} {'± ' + format(ci / unit, ',.1f'):>18}")
+    print("Note: duplicate records in overlapping log copies are not removed; the full run skips them")
+
+    for kind in ('queue', 'software'):
+        names = {k[1] for _, blocks, tail in samples for b in blocks + [tail]
+                 for k in b if isinstance(k, tuple) and k[0] == kind}
+        est = sorted(((n, estimate_total(samples, (kind, n))) for n in names), key=lambda kv: kv[1][0], reverse=True)
+        if not est: continue
+        print(f"\nBy {kind} (core-hours):")
+        for n, (v, ci) in est[:top]:
+            print(f"  {n:<20} {v / 3600:>16,.1f} {'± ' + format(ci / 3600, ',.1f'):>18}")
@@ -0,0 +1,179 @@
+import os
+import zlib
+import heapq
+import pickle
+import itertools
+import tempfile
+from array import array
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，缺失时用 sorted() 排序 (临时占用约 5 倍内存)
+    np = None
+from job_arrays import compact_rows, expand_rows
+from job_records import iter_rows, user_sort_key
+from job_stats import JobStats
+
+# --- 内存上限下的落盘聚合 (--max-memory) ---
+# 1. worker 不再把作业行返回给父进程，而是按内存预算分批: 每批按 (用户, 去重键) 排序，
+#    按 crc32(用户) 分区写成有序 run 文件
+# 2. 父进程逐个分区多路归并 run 文件，同一用户的作业相邻出现，逐用户聚合后立即释放；
+#    重复记录必属同一用户，归并后彼此相邻，用户内去重即可
+# 3. 需要全部取值的统计 (中位数、分布、集群与用户的占用事件) 交给 ExternalSorter: 超过阈值时排序落盘，
+#    读取时多路归并成有序流。add_job 直接向排序器追加，不在统计字典里积累列表；
+#    用户内去重只需比较上一个去重键 (LastKey)，内存与单个用户的作业数无关
+N_PARTITIONS = 16
+# 估算一条作业行在内存中的大小 (list + 字符串 + 主机元组 + 落盘时的排序键)，用于把内存预算换算成行数
+ROW_BYTES = 1280
+# run 文件的分块行数: 归并时每个 run 文件只有一块在内存中，块小则同时打开很多 run 文件也不占内存
+_CHUNK_ROWS = 128
+_READ_VALUES = 1 << 16
+
+def partition_of(user, n_partitions):
+    """ 不能用内置 hash(): 各进程的字符串哈希种子不同 """
+    return zlib.crc32(user.encode()) % n_partitions
+
+class RunWriter:
+    """ worker 端: 缓冲作业行，满额后排序并按分区写出 run 文件 """
+    def __init__(self, spill_dir, n_partitions, buffer_rows, key):
+        self.spill_dir = spill_dir
+        self.n_partitions = n_partitions
+        self.buffer_rows = buffer_rows
+        self.key = key
+        self.buffer = []
+        self.runs = []
+
+    def add(self, job):
+        self.buffer.append(job)
+        if len(self.buffer) >= self.buffer_rows: self.flush()
+
+    def flush(self):
+        if not self.buffer: return
+        parts = {}
+        for job in self.buffer:
+            parts.setdefault(partition_of(job[0], self.n_partitions), []).append(job)
+        self.buffer = []
+        for p, rows in parts.items():
+            rows.sort(key=self.key)
+            # 同一 worker 进程会先后处理多个文件，文件名必须全局唯一
+            fd, path = tempfile.mkstemp(prefix=f"p{p:03d}-", suffix=".run", dir=self.spill_dir)
+            with os.fdopen(fd, 'wb') as f:
+                for i in range(0, len(rows), _CHUNK_ROWS):
+                    # 行已按 (用户, 去重键) 排序，同一作业数组的元素相邻，压缩后展开顺序不变
+                    pickle.dump(compact_rows(rows[i:i + _CHUNK_ROWS]), f, protocol=pickle.HIGHEST_PROTOCOL)
+            self.runs.append((p, path))
+
+def iter_run(path):
+    with open(path, 'rb') as f:
+        while True:
+            try: chunk = pickle.load(f)
+            except EOFError: return
+            yield from expand_rows(chunk)
+
+def merge_runs(paths, key):
+    """ 多路归并若干有序 run 文件 """
+    return heapq.merge(*(iter_run(p) for p in paths), key=key)
+
+class ExternalSorter:
+    """
+    整数 (或浮点) 取值的外部排序: 内存中最多保留 limit 个值，超出则排序后写成临时文件
+    同时维护 count / total，均值无需再读一遍；keep=False 时只统计 count / total (如效率只需均值)
+    """
+    def __init__(self, spill_dir, limit, typecode='q', keep=True):
+        self.spill_dir = spill_dir
+        self.limit = max(1, limit)
+        self.typecode = typecode
+        self.keep = keep
+        self.buf = array(typecode)
+        self.files = []
+        self.count = 0
+        self.total = 0
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if not self.keep: return
+        self.buf.append(value)
+        if len(self.buf) >= self.limit: self._spill()
+
+    # 与 list.append 同名: 统计字典中的原始列表可直接换成外部排序器
+    append = add
+
+    def extend(self, values):
+        for v in values: self.add(v)
+
+    def _sorted_buf(self):
+        """ 内存中的取值排序为 array；numpy 原地排序，不为每个值创建 Python 对象 """
+        if np is None: return array(self.typecode, sorted(self.buf))
+        a = np.frombuffer(self.buf, dtype=self.typecode).copy()
+        a.sort()
+        return array(self.typecode, a.tobytes())
+
+    def _spill(self):
+        fd, path = tempfile.mkstemp(prefix="sort-", suffix=".bin", dir=self.spill_dir)
+        with os.fdopen(fd, 'wb') as f:
+            self._sorted_buf().tofile(f)
+        self.files.append(path)
+        self.buf = array(self.typecode)
+
+    def _iter_file(self, path):
+        with open(path, 'rb') as f:
+            while True:
+                a = array(self.typecode)
+                try: a.fromfile(f, _READ_VALUES)
+                except EOFError:
+                    yield from a
+                    return
+                yield from a
+
+    def __iter__(self):
+        """ 升序遍历全部取值 """
+        mem = self._sorted_buf()
+        if not self.files: return iter(mem)
+        return heapq.merge(mem, *(self._iter_file(p) for p in self.files))
+
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+    def median(self):
+        """ 与 statistics.median 一致: 偶数个时取中间两数的平均 """
+        n = self.count
+        if n == 0: return 0
+        mid = list(itertools.islice(iter(self), (n - 1) // 2, n // 2 + 1))
+        return mid[0] if n % 2 else (mid[0] + mid[1]) / 2
+
+    def close(self):
+        for p in self.files:
+            try: os.remove(p)
+            except OSError: pass
+        self.files = []
+        self.buf = array(self.typecode)
+
+class LastKey:
+    """ 代替 add_job 的 seen 集合: 输入按去重键排序时重复记录彼此相邻，只需记住上一个键 """
+    __slots__ = ('key',)
+
+    def __init__(self):
+        self.key = None
+
+    def __contains__(self, key):
+        return key == self.key
+
+    def add(self, key):
+        self.key = key
+
+def spill_single_file(file_path, year, year_start, year_end, next_path, spill_dir, n_partitions, buffer_rows, block_size):
+    """ --max-memory 模式的 worker: 返回 ([(分区, run 文件), ...], JobStats)；block_size 为按预算缩小的预读块 """
+
+    writer = RunWriter(spill_dir, n_partitions, buffer_rows, user_sort_key)
+    local_stats = JobStats()
+    jobs = 0
+    print(f"🚀 [PID {os.getpid()}] Processing: {os.path.basename(file_path)}")
+    try:
+        for job in iter_rows([file_path], year_start, year_end, next_path=next_path, block_size=block_size):
+            writer.add(job)
+            local_stats.add(job)
+            jobs += 1
+        writer.flush()
+    except Exception as e: print(f"Error: {e}")
+    print(f"✅ [PID {os.getpid()}] Finished {os.path.basename(file_path)}: {jobs} jobs, {len(writer.runs)} runs")
+    return writer.runs, local_stats
@@ -0,0 +1,58 @@
+import heapq
+
+from job_records import job_efficiency, job_info
+
+# --- 每个用户的 Top-K 作业 ---
+# 不保留全部作业，只为每个用户 (及 "all") 的每个指标维护容量为 K 的最小堆，堆顶是当前第 K 名，
+# 新作业只需与堆顶比较。worker 内各自维护，父进程合并: 按去重键去重后取前 K 名，
+# 全局前 K 名必然出现在某个 worker 的局部前 K 名中，因此合并结果是精确的。
+TOP_K = 10
+# 运行时间太短的作业效率波动大，不参与 "效率最差" 排名
+MIN_EFF_RUNTIME = 600
+METRICS = ('core_hours', 'runtime', 'wait', 'worst_eff')
+
+def push_unique(heap, score, key, info, k):
+    """ 容量为 k 的最小堆，堆元素 (score, key, info)；key 唯一，保证比较不会落到 info (dict) 上 """
+    if len(heap) < k:
+        if any(e[1] == key for e in heap): return
+        heapq.heappush(heap, (score, key, info))
+    elif (score, key) > heap[0][:2]:
+        if any(e[1] == key for e in heap): return
+        heapq.heapreplace(heap, (score, key, info))
+
+def top_add(tops, job, key, k=TOP_K):
+    """ tops: {user: {metric: heap}}；key 为作业去重键 (job_records.job_key) """
+    info = None
+    scores = {'core_hours': job[6] * job[3], 'runtime': job[6], 'wait': job[5]}
+    if job[6] >= MIN_EFF_RUNTIME: scores['worst_eff'] = -job_efficiency(job)
+    for target in (job[0], "all"):
+        heaps = tops.get(target)
+        if heaps is None: heaps = tops[target] = {m: [] for m in METRICS}
+        for metric, score in scores.items():
+            heap = heaps[metric]
+            if len(heap) >= k and (score, key) <= heap[0][:2]: continue
+            if info is None: info = job_info(job)
+            push_unique(heap, score, key, info, k)
+
+def top_merge(dst, src, k=TOP_K):
+    """ 合并两组 Top-K (去重后取前 K 名)，满足交换律与结合律 """
+    for user, heaps in src.items():
+        d_heaps = dst.get(user)
+        if d_heaps is None:
+            dst[user] = {m: list(h) for m, h in heaps.items()}; continue
+        for metric, heap in heaps.items():
+            d_heaps[metric] = merge_heaps(d_heaps[metric], heap, k)
+    return dst
+
+def merge_heaps(a, b, k):
+    """ 两个 push_unique 维护的堆按 key 去重后取前 k 名，返回新堆 """
+    merged = {e[1]: e for e in a}
+    for e in b: merged.setdefault(e[1], e)
+    best = heapq.nlargest(k, merged.values(), key=lambda e: e[:2])
+    heapq.heapify(best)
+    return best
+
+def top_finalize(heaps):
+    """ {metric: heap} -> {metric: [info, ...]} 按名次排序 """
+    return {metric: [e[2] for e in sorted(heap, key=lambda e: e[:2], reverse=True)]
+            for metric, heap in heaps.items()}
@@ -0,0 +1,45 @@
+from job_records import JOB_STAT_EXIT
+from topk import MIN_EFF_RUNTIME
+
+# --- 浪费的核时: 失败作业与低效作业 ---
+# 每个用户 (及 "all") 按软件累加固定几个计数，内存只与 用户数 x 软件数 有关，与作业数无关。
+# EXIT 作业 (非零退出或被 kill) 的核时全部计为浪费；正常结束但 CPU 效率低于 LOW_EFF 的作业
+# 另计为低效，两者互不重叠，可直接相加。
+# 核时加权效率 = 实际 CPU 时间 / 占用核时，大作业权重更大，比逐作业平均更能反映资源利用率。
+LOW_EFF = 50
+WASTE_FIELDS = ('jobs', 'core_seconds', 'cpu_seconds', 'exit_jobs', 'exit_core_seconds',
+                'low_eff_jobs', 'low_eff_core_seconds')
+
+def _counters():
+    return dict.fromkeys(WASTE_FIELDS, 0)
+
+def waste_add(waste, job):
+    """ waste: {software: 计数}；单个作业的 CPU 时间按占用核时封顶 (与逐作业效率封顶 100% 一致) """
+    cores, soft, run, cpu, status = job[3], job[4], job[6], job[7], job[13]
+    cs = run * cores
+    w = waste.get(soft)
+    if w is None: w = waste[soft] = _counters()
+    w['jobs'] += 1
+    w['core_seconds'] += cs
+    w['cpu_seconds'] += cpu if cpu < cs else cs
+    if status & JOB_STAT_EXIT:
+        w['exit_jobs'] += 1
+        w['exit_core_seconds'] += cs
+    elif run >= MIN_EFF_RUNTIME and cpu * 100 < LOW_EFF * cs:
+        w['low_eff_jobs'] += 1
+        w['low_eff_core_seconds'] += cs
+
+def waste_merge(dst, src):
+    for soft, counters in src.items():
+        w = dst.get(soft)
+        if w is None: w = dst[soft] = _counters()
+        for k, v in counters.items(): w[k] += v
+    return dst
+
+def waste_total(waste):
+    """ 各软件计数求和，并附加核时加权效率 weighted_efficiency (%) """
+    total = _counters()
+    for counters in waste.values():
+        for k, v in counters.items(): total[k] += v
+    total['weighted_efficiency'] = round(total['cpu_seconds'] / total['core_seconds'] * 100, 2) if total['core_seconds'] else 0.0
+    return total